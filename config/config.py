@@ -2,15 +2,28 @@ from datetime import date
 
 open = 8 # site opening time (int)
 close = 20 # site closing time (int)
+siteHours = {} # per-site (open, close) overrides of the two values above, e.g. {"HHF": (9, 17)}
 holidays = [] # each elem should be in form "YYYY, MM, DD", e.g. ["2022, 5, 30", "2022, 6, 20", "2022, 7, 4"]
 nonAutoStates = ['Grounded', 'Manual Only']
+cacheFile = "jira-tracker-cache.sqlite3" # local issue cache, see tracker/issueCache.py. Safe to delete at any time
+maxConcurrentRequests = 8 # upper bound on parallel Jira search requests. Lowered automatically while Jira is rate limiting
+
+"""
+Auto readiness definitions. Each receives 'down', which maps every vehicle class ('Lexus', 'WAMs') to the number of vehicles of that class that are down (manual only or grounded), and returns True while the site is auto ready. 
+The counts are NumPy arrays (one entry per stretch of time), so combine conditions with &, | and ~ instead of and, or and not.
+Sites not listed in autoReadiness use defaultAutoReadiness: no more than one Lexus down, and the WAMs not down.
+"""
+def defaultAutoReadiness(down):
+    return (down['Lexus'] <= 1) & (down['WAMs'] == 0)
+
+autoReadiness = {} # e.g. {"HHF": lambda down: (down['Lexus'] == 0) & (down['WAMs'] == 0)}
 
 ###########################################################################################################################################################
 ###################         Nothing below should need to be changed. Exceptions might include something like site fleet changes         ###################
 ###########################################################################################################################################################
 
 """
-The WAMs vehicle must be the last item in each list!
+The WAMs vehicle must be the last item in each list! Every other vehicle is a Lexus.
 """
 mayFleet = {
     "INF": ['Mandu', 'Marbles', 'Mvemjsunp', 'Mario', 'Mooi'], 
@@ -19,6 +32,7 @@ mayFleet = {
     "GRF": ['Minerva', 'Meow', 'Michigan', 'Murphy'],
     "HHF": ['Maria', 'Myla', 'Mimi']
     }
+vehicleClasses = ['Lexus', 'WAMs']
 
 """
 Given a quarter of the year [1,2,3,4], return the start and end of the quarter in dates as strings, in the form YYYY-MM-DD
@@ -33,4 +47,22 @@ def getQuarter(quarter):
     }   
     return quarters[quarter][0], quarters[quarter][1]
 
+"""
+Returns the (open, close) operating hours of the given site, in military time.
+"""
+def getSiteHours(site):
+    return siteHours.get(site, (open, close))
 
+"""
+Returns the class ('Lexus' or 'WAMs') of a vehicle at the given site. Names are compared case-insensitively, since the Jira value is capitalized (e.g. 'Mchale' for 'McHale'). A vehicle that isn't in the site's fleet is an error rather than a Lexus, so update mayFleet when the fleet changes.
+"""
+def getVehicleClass(site, vehicle):
+    fleet = [name.lower() for name in mayFleet[site]]
+    assert vehicle.lower() in fleet, "Vehicle {0} is not in the {1} fleet {2}, update mayFleet in config/config.py".format(vehicle, site, mayFleet[site])
+    return 'WAMs' if vehicle.lower() == fleet[-1] else 'Lexus'
+
+"""
+Returns the auto readiness definition of the given site, see autoReadiness.
+"""
+def getAutoReadiness(site):
+    return autoReadiness.get(site, defaultAutoReadiness)
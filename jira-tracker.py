@@ -5,333 +5,661 @@ This program uses the Jira API to calculate the total autonomy availability upti
 
 Uptime is defined as having no more than one Lexus in a non-auto ready state (manual only or grounded) as determined by Jira tickets. This means that any time the GEM goes out of a Monitor status, downtime is accruing. 
 
-100% auto readiness therefore is limited to two cases: where the whole fleet is auto ready, or where only one Lexus is NOT auto ready.
+100% auto readiness therefore is limited to two cases: where the whole fleet is auto ready, or where only one Lexus is NOT auto ready. Sites with a different definition can override it in config.autoReadiness.
 
 TODO: 
     - Handle cases where the ticket is opened in non-auto state and does NOT change state before being closed!
-    - Identify those tickets which most severely impact auto-readiness, i.e. has the greatest downtime (could be as simple as finding top 5 elems in sorted list)
-    - Add a function checkAutoReadiness() that clearly applies auto readiness condition logic so this program can be easily changed for changing definition in future. Currently all of that logic is in computeDowntime
-    - 'Auto readiness' definition will differ slightly be site. Account for this! See point 3. 
     - Add a downtime visualizer? Might be nice. 
-    - Add relevant downtime tickets to a dataframe, and allow user to have option to output content to a csv or similar
     - Make terminal output look nicer
 """
 
 from jira import JIRA
-from pandas import Timedelta, to_datetime, bdate_range, Timestamp
-from numpy import busday_count
+from requests.adapters import HTTPAdapter
+from pandas import Timedelta, to_datetime, Timestamp
+from pandas import DataFrame
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 import argparse
+import json
+import os
+import numpy as np
 
 import config.config as config
-import config.jiraConfig as jiraConfig
+from tracker.issueCache import IssueCache, compactIssue
+from tracker.issueRecords import issueRecord
+from tracker.businessCalendar import siteCalendar, toEpochSeconds
+from tracker.readiness import buildTimeline, accruedDowntime, DowntimeCurve, downtimeSeries, downtimeShares, attributedImpact, topImpacts
+from tracker.pagination import AdaptiveLimiter, callWithBackoff, fetchConcurrently
+from tracker.intervalTable import IntervalTable, IntervalTableBuilder
+from tracker.service import ReadinessStore, serve
+from tracker.scenarios import scenarioTimeline, scenarioDowntime
+import tracker.instrumentation as instrumentation
 
 """
-Checks for required command line input. Doesn't return anything - instead, defines the args as a global namespace. 
+The only issue fields read by this program: creation and last update dates, vehicle name and current vehicle state impact. Requesting just these keeps each search page small.
 """
-def parseArgs():
+ISSUE_FIELDS = ['created', 'updated', 'customfield_10068', 'customfield_10064']
+
+"""
+Checks for required command line input. Doesn't return anything - instead, defines the args as a global namespace. Parses sys.argv unless a list of arguments is given.
+"""
+def parseArgs(argv: list = None):
     parser = argparse.ArgumentParser(description='This program uses the Jira API to calculate the total autonomy availability uptime for the Ann Arbor May fleet.')
     parser.add_argument('-e', '--exclude', type = str, default="",
                         help='Jira ticket IDs to exclude. Must be a single string where keys are comma delineated, e.g. "INF-1380, INF-1381"')
+    parser.add_argument('-f', '--fetch-mode', type = str, default="embedded", choices=["embedded", "per-issue"],
+                        help='embedded: changelogs come back inside the paged search (one request per page). per-issue: fetch each changelog separately (one request per ticket).')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Skip the local issue cache (config.cacheFile) and fetch every issue for the quarter from Jira.')
+    parser.add_argument('--offline', action='store_true',
+                        help='Answer from the local issue cache only, without contacting Jira. The site and quarter must have been synced by an earlier run.')
+    parser.add_argument('-o', '--output', type = str, default=None,
+                        help='Export the downtime intervals to this file: Parquet if it ends in .parquet (requires pyarrow), CSV otherwise. Batch runs add the site and quarter to the file name.')
+    parser.add_argument('--series', type = str, default=None, choices=["day", "hour"],
+                        help='Also print the auto readiness of every day or hour of the quarter (or --range). Single site and quarter runs only.')
+    parser.add_argument('--top', type = int, default=0,
+                        help='Also print the N tickets and vehicles responsible for the most downtime. Single site and quarter runs only.')
+    parser.add_argument('--serve', type = int, default=None, metavar='PORT',
+                        help='Run as a service on localhost:PORT, holding the given sites and quarters in memory and answering readiness queries for any date range within them. See tracker/service.py.')
+    parser.add_argument('--replay', type = str, default=None, metavar='FILE',
+                        help='With --serve, apply the Jira webhook payloads in FILE (one JSON object per line) before serving.')
+    parser.add_argument('--what-if', action='store_true',
+                        help='Compare the auto readiness under a grid of alternative definitions, built from --lexus-down, --hours and --without, from a single fetch of the tickets. Prints a comparison table. Single site and quarter runs only.')
+    parser.add_argument('--lexus-down', type = int, default=None, nargs='+', metavar='N',
+                        help='With --what-if, the numbers of Lexus allowed down at once (with the WAMs up) to compare. Defaults to the site\'s definition in config.autoReadiness.')
+    parser.add_argument('--hours', type = str, default=None, nargs='+', metavar='OPEN-CLOSE',
+                        help='With --what-if, site operating hours to compare, in military time, e.g. 8-20 9-17. Defaults to the site\'s hours.')
+    parser.add_argument('--without', type = str, default=None, nargs='+', metavar='KEYS',
+                        help='With --what-if, sets of tickets to leave out, each a comma delineated string of keys, e.g. "AA-12" "AA-12, AA-15". The run that leaves out no tickets is always included.')
+    parser.add_argument('--profile', type = str, default=None, metavar='FILE',
+                        help='Write a JSON report of stage timings, HTTP request and byte counts, retries, and issue and interval counts to FILE.')
+    parser.add_argument('--profile-hot-paths', action='store_true',
+                        help='With --profile, also run cProfile and include the functions with the greatest cumulative time in the report.')
+    parser.add_argument('-j', '--jobs', type = int, default=os.cpu_count() or 1,
+                        help='Number of worker processes used when several sites and/or quarters are given. Defaults to the number of cores.')
 
     # create separate group for required args to fix --help optional/required output
     requiredNamed = parser.add_argument_group('required named arguments')
-    requiredNamed.add_argument('-s', '--site', type = str, required=True,
-                        help='Site name.', choices=["AA", "INF", "ARL","HHF", "GRF"])
-    requiredNamed.add_argument('-q', '--quarter', type = int, required=True,
-                        help='Quarter of the year', choices=[1,2,3,4])
+    requiredNamed.add_argument('-s', '--site', type = str, required=True, nargs='+', dest='sites',
+                        help='Site name. Give several to compute them all in one batch run.', choices=["AA", "INF", "ARL","HHF", "GRF"])
+    requiredNamed.add_argument('-q', '--quarter', type = int, default=None, nargs='+', dest='quarters',
+                        help='Quarter of the year. Give several to compute them all in one batch run. Required unless --range or --rolling is given.', choices=[1,2,3,4])
+    requiredNamed.add_argument('-r', '--range', type = str, default=None, nargs=2, metavar=('START', 'END'),
+                        help='Compute the date range [START, END) (YYYY-MM-DD) instead of a quarter.')
+    requiredNamed.add_argument('--rolling', type = int, default=None, metavar='DAYS',
+                        help='Compute the last DAYS days, from midnight DAYS - 1 days ago up to now, instead of a quarter.')
     
     global args
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    assert not (args.offline and args.no_cache), "--offline answers from the issue cache, so it cannot be combined with --no-cache"
+    assert not (args.profile and args.serve is not None), "--serve runs until interrupted, so it cannot write a --profile report"
+    assert args.jobs > 0, "--jobs needs a positive number of worker processes"
+    assert [args.quarters, args.range, args.rolling].count(None) == 2, "Give exactly one of --quarter, --range or --rolling"
+    if args.rolling is not None:
+        assert args.rolling > 0, "--rolling needs a positive number of days"
+        # the window ends now, not at midnight, so the rest of today's operating hours, which haven't happened yet, don't count as auto ready time
+        now = Timestamp.now().floor('min')
+        args.range = [(now.normalize() - Timedelta(days=args.rolling - 1)).strftime('%Y-%m-%d'), now.strftime('%Y-%m-%d %H:%M')]
+    if args.range is not None:
+        assert to_datetime(args.range[0]) < to_datetime(args.range[1]), "The --range start must come before its end"
+        args.quarters = [None]
+    assert not args.what_if or (len(args.sites) * len(args.quarters) == 1 and args.serve is None), "--what-if compares definitions for a single site and quarter"
+    selectSiteQuarter(args.sites[0], args.quarters[0])
+
+"""
+Sets the site and quarter (args.site, args.quarter) that the functions below operate on. The quarter is None when a --range or --rolling period was given instead.
+"""
+def selectSiteQuarter(site: str, quarter: int):
+    args.site, args.quarter = site, quarter
+
+"""
+Returns the start and end ('YYYY-MM-DD', end exclusive; a --rolling period ends at the current time, 'YYYY-MM-DD HH:MM') of the period of interest: the --range (or --rolling) period if one was given, otherwise the selected quarter.
+"""
+def periodOfInterest() -> tuple:
+    if args.range is not None:
+        return args.range[0], args.range[1]
+    return config.getQuarter(args.quarter)
+
+"""
+Returns a short name for the period of interest, e.g. 'Q1' or '2022-07-01..2022-08-01'.
+"""
+def periodLabel() -> str:
+    if args.range is not None:
+        return '{0}..{1}'.format(*args.range)
+    return 'Q{0}'.format(args.quarter)
 
 """
 Returns a Jira class generated from the jira config info.
 """
 def createServerInstance() -> JIRA:
+    import config.jiraConfig as jiraConfig # imported here so that --offline runs don't need credentials
     serverOptions = {'server': jiraConfig.serverName}
-    jiraServer = JIRA(options=serverOptions, basic_auth=(jiraConfig.email, jiraConfig.jiraToken))
+    # max_retries=0: the client's own session would otherwise retry 429 responses itself, sleeping while holding a slot of the
+    # AdaptiveLimiter, so callWithBackoff would never see the throttling and the concurrency would never be lowered. Every request
+    # goes through callWithBackoff instead, which also retries transient server and connection errors
+    jiraServer = JIRA(options=serverOptions, basic_auth=(jiraConfig.email, jiraConfig.jiraToken), max_retries=0)
+
+    # keep one pooled connection per concurrent request, see iterRelatedIssues
+    jiraServer._session.mount(jiraConfig.serverName, HTTPAdapter(pool_maxsize=config.maxConcurrentRequests))
+    instrumentation.countResponses(jiraServer._session)
     return jiraServer
 
+"""
+Returns the AdaptiveLimiter (see tracker/pagination.py) shared by every request made to the given Jira server instance, so that search pages and changelog requests together stay within config.maxConcurrentRequests and all back off while Jira is rate limiting.
+"""
+@lru_cache(maxsize=None)
+def requestLimiter(jira: JIRA) -> AdaptiveLimiter:
+    return AdaptiveLimiter(config.maxConcurrentRequests)
+
 """ 
 Given the date range of interest, compute and return total time in seconds that the site is open (service hours). Return type is int.
 """
 def computeTotalTime() -> int:
-    start, end = config.getQuarter(args.quarter)
-    # TODO: Why not use bdate_range() to avoid redundant imports?
-    NUM_WEEKDAYS = busday_count(start, end)
-    SECONDS_IN_BUSINESS_DAY = (config.close - config.open) * 3600
-    return NUM_WEEKDAYS * SECONDS_IN_BUSINESS_DAY
+    return siteCalendar(args.site, *periodOfInterest()).totalSeconds()
 
 """
-Given two pandas datetime objects with timestamps in the form ('YYYY-MM-DD HH:MM:SS.XXXXXX'), compute the downtime. Downtime only accrues for business days within the range defined by the bounds [start, end]. The start and end timestamps are generated from Jira ticket update and creation timestamps, so it must be checked that these times fall within normal site operating hours (since we only want to accrue downtime while the site is open for business), and if not, adjust them for the final computation. The sum deltaT is the accrued downtime, which is stored in a pandas Timedelta object, and is what this function returns.
+Given two pandas datetime objects with timestamps in the form ('YYYY-MM-DD HH:MM:SS.XXXXXX'), compute the downtime. Downtime only accrues during site operating hours on business days (weekdays that are not in config.holidays) within the range defined by the bounds [start, end]. The start and end timestamps are generated from Jira ticket update and creation timestamps, so they often fall outside of operating hours; only the operating time between them is counted.
 
-The order of operations here are: 
-1. Coerce given start and end datetimes to fall within the [site open hours, site closed hours] interval as needed
-2. Compute difference between end and start times in seconds
-3. Based on whether the end day time (only considering seconds in day) is greater than the start
+The computation is two lookups into the site's business calendar, which holds the cumulative operating seconds of the period of interest, and a subtraction. To score many intervals at once, pass arrays of epoch seconds to siteCalendar(...).operatingSeconds directly.
 
 INPUT: 
-- start, the opening bound of the down time interval passed to this function. pd.Timestamp
-- end, the closing bound of the down time interval passed to this function. pd.Timestamp
+- start, the opening bound of the down time interval passed to this function. pd.Timestamp, or epoch seconds as stored in an IntervalTable
+- end, the closing bound of the down time interval passed to this function. pd.Timestamp, or epoch seconds as stored in an IntervalTable
 OUTPUT:
 - directly returns a pd.Timedelta object, in seconds
 """
+@instrumentation.timed('computeTimeDelta')
 def computeTimeDelta(start: Timestamp, end: Timestamp) -> Timedelta:
-    SITE_DAILY_OPERATING_SECONDS = (config.close - config.open) * 3600
-
-    # check if interval open/closing times are confined to site operating hours, and re-assign hours as needed
-    if start.hour < config.open:
-        start = start.replace(hour = 8, minute = 0, second = 0)
-    if  start.hour > config.close:
-        start = start.replace(hour = 8, minute = 0, second = 0) + Timedelta(days=1)
-    if end.hour > config.close:
-        end = end.replace(hour = 20, minute = 0, second = 0)
-    if end.hour  < config.open:
-        end = end.replace(hour = 20, minute = 0, second = 0) - Timedelta(days=1)
-
-    # compute difference in business days between bounds and convert to seconds
-    diff = len(bdate_range(start, end, inclusive='neither')) * SITE_DAILY_OPERATING_SECONDS
-
-    # compute difference in seconds (assuming same day bounds)
-    endTimeInSeconds = end.hour * 3600 + end.minute*60 + end.second
-    startTimeInSeconds = start.hour * 3600 + start.minute*60 + start.second
-
-    # if the end time is greater than the start time, just subtract them
-    if endTimeInSeconds > startTimeInSeconds:
-        diff += endTimeInSeconds - startTimeInSeconds
-        return Timedelta(diff, unit='seconds')
-    # otherwise, diff += |site close - start time| + |site open - end time|, where end time < start time. Note start and end time have been coerced into times between hours of operation at this point in the function
-    else:
-        diff += (abs(end.replace(day = start.day, hour = config.close, minute = 0, second = 0) - start) + abs((end.replace(day = end.day, hour = config.open, minute = 0, second = 0) - end))).total_seconds()
-        return Timedelta(diff, unit='seconds')
+    calendar = siteCalendar(args.site, *periodOfInterest())
+    return Timedelta(int(calendar.operatingSeconds(toEpochSeconds(start), toEpochSeconds(end))), unit='seconds')
 
 """
-Given a date as a string in the form 'YYYY-MM-DD', or a string in the date time format used by Jira (e.g. '2022-01-14T13:25:07.139-0500'), convert the string to a pandas datetime object and strip any possible timezone information, as we are interested in absolute time differences only. If needed, coerce downtime interval start and end datetime bounds to conform to the period of time we are interested in. 
-
-e.g, if we are looking at the first quarter of the year, and downtime accrued prior to and through the new year, we would not want to count the downtime prior to the new year, only the time from the interval [YYYY-01-01 00:00:00, time vehicle was fixed]. 
-
-INPUT: A pandas timestamp object, and a string passed to the function that indicates if the datetime is the 'open' (start) or 'close' (end) of an interval.
-OUTPUT: a pandas timestamp object 
-"""
-def createDatetimeObject(date: str, bound: str) -> Timestamp:
-    datetime = to_datetime(date).tz_localize(None)
-    startQuarter, endQuarter = config.getQuarter(args.quarter)
-    open = to_datetime(startQuarter).tz_localize(None)
-    close = to_datetime(endQuarter).tz_localize(None)
-
-    # check for invalid datetimes, i.e. when a ticket is closed prior to period of interest but gets 'updated' with a comment WITHIN the period of interest
-    # returning either bound of the period of interest should result in identical intervals i.e. [start, start] so no downtime would accrue for these tickets
-    if bound == 'end' and datetime < open:
-        return open
-    if bound == 'start' and datetime > close:
-        return close 
-
-    # check for valid datetimes but check if they need to be corrected
-    if bound == 'start' and datetime < open:
-        datetime = open
-    if bound == 'end' and datetime > close:
-        datetime = close
-    return datetime
+This function requires that all relevant json data have been collected using the Jira REST API and reduced to issue records (see tracker/issueRecords.py). It parses through the records (tickets) and generates a list (downtimeIntervals) of datetime intervals and relevant vehicle name. It works primarily by inspecting the 'Vehicle State Impact' transitions in the 'history' tab of each Jira issue, including those that are not the first item of their history entry. It also checks for tickets that were created in a non-auto ready state and were eventually updated to an auto ready state, within the period of interest.
 
-"""
-This function requires that all relevant json data have been collected using the Jira REST API. This data is provided to it through the relatedIssues input. It parses through items (tickets) in relatedIssues and generates a list (downtimeIntervals) of datetime intervals and relevant vehicle name. It works primarily by inspecting the 'history' tab of each Jira issue for a change in the 'Vehicle State Impact' field. It also checks for tickets that were created in a non-auto ready state and were eventually updated to an auto ready state, within the quarter of interest.
+A vehicle goes down at the first change to a non-auto state (config.nonAutoStates) and comes back up at the next change to 'Monitor'; a change between two non-auto states does not restart the interval, and a change to 'Monitor' while the vehicle is not down adds nothing.
 
 INPUT: 
-    - relatedIssues: A list of jira ticket objects (jira.client.ResultList), converted from raw json to a class by the Jira module
-    - jira: a jira server instance (jira.client.JIRA)
+    - issueRecords: A list (or any iterable, e.g. records streamed from iterIssueRecords) of IssueRecords.
     - dateTimeRange: two element list containing pandas datetime objects - the closed interval for the date range of interest 
 OUTPUT:
-    - A three element list containing an interval, and the related vehicle name e.g. [initialDatetime (pd.Timestamp), finalDatetime (pd.Timestamp), vehicle (str)]. These intervals are filtered out from the list of Jira tickets for the given dateTimeRange. The interval itself indicates the time range where the vehicle was NOT auto ready, but does not include any information as to the specific state of the vehicle (manual only or grounded), as these are not needed in the scope of this program's objective.
+    - An IntervalTable (see tracker/intervalTable.py) with one row per interval: start and end as epoch seconds, the related vehicle, and the issue key. These intervals are filtered out from the list of Jira tickets for the given dateTimeRange. The interval itself indicates the time range where the vehicle was NOT auto ready, but does not include any information as to the specific state of the vehicle (manual only or grounded), as these are not needed in the scope of this program's objective.
 
 TODO: Check for tickets that were created with vehicle in non-auto ready state, vehicle impact never changed, and then closed in non-auto ready state (presumably, the vehicle was fixed but the ticket not updated)
 """
-def generateDowntimeIntervals(relatedIssues: list, jira: JIRA, dateTimeRange: list) -> list:
-    startDatetime, endDatetime = dateTimeRange[0], dateTimeRange[1]
-    downtimeIntervals = []
+def generateDowntimeIntervals(issueRecords, dateTimeRange: list) -> IntervalTable:
+    startSeconds, endSeconds = int(toEpochSeconds(dateTimeRange[0])), int(toEpochSeconds(dateTimeRange[1]))
+    clamp = lambda seconds: min(max(seconds, startSeconds), endSeconds) # coerce a time into the period of interest
+    downtimeIntervals = IntervalTableBuilder()
 
-    print("Generating downtime intervals...")
+    def addInterval(record, downSeconds: int, upSeconds: int):
+        downtimeIntervals.appendSeconds(downSeconds, upSeconds, record.vehicle, record.key)
+        print(record.key, "\t", record.vehicle, "\t", Timestamp(downSeconds, unit='s'), "\t", Timestamp(upSeconds, unit='s'))
 
-    for issue in relatedIssues:
+    print("Generating downtime intervals...")
 
-        # fetch the history for a particular issue using the issue key (ex. 'AA-598'). The slicing ensures the history is in ascending datetime order
-        changelog = jira.issue(id=issue.id, expand='changelog').changelog.histories[::-1]
+    for record in issueRecords:
+        instrumentation.increment('issues')
+        if record.vehicle is None: # the ticket doesn't name a vehicle, so its downtime can't be attributed
+            continue
         initialCondition = True # used to track if ticket was created in non-auto ready state
-        initialDate = createDatetimeObject(issue.fields.created, 'start')
-        vehicle = issue.fields.customfield_10068[0].capitalize()
+        downSeconds = None
 
-        for i, change in enumerate(changelog):
-            vehicleImpact = changelog[i].items[0]
-            changeDate = createDatetimeObject(change.created, 'end')
+        for changeSeconds, vehicleImpact in record.transitions:
 
-            # if history item changes Vehicle State Impact and change was made within period of interest
-            if vehicleImpact.field == 'Vehicle State Impact' and changeDate > startDatetime and changeDate < endDatetime:
+            # only changes made within period of interest count
+            if not startSeconds < changeSeconds < endSeconds:
+                continue
+
+            if vehicleImpact == 'Monitor':
 
                 # if ticket was created in non-auto ready state -- vehicle impact only changed to monitor from grounded or manual only
-                if vehicleImpact.toString == 'Monitor' and initialCondition == True:
-                    initialCondition = False
+                if initialCondition:
+                    addInterval(record, clamp(record.created), changeSeconds)
 
-                    # if ticket was created in non-auto state but vehicle impact was updated within period of interest
-                    if initialDate < startDatetime:
-                        initialDate = startDatetime
-    
-                    downtimeIntervals.append([initialDate, changeDate, vehicle])
-                    print(issue.key, "\t", vehicle, "\t", initialDate, "\t", changeDate)
-                    continue
-
-                # catch when cars are made non-auto ready in ticket history when the change occurs after the start of the period of interest
-                if (vehicleImpact.toString == 'Manual Only' or vehicleImpact.toString == 'Grounded'):
-                    initialCondition = False
-                    downDate = changeDate
-                
-                # mark the transition from non-auto ready to auto-ready, compute instance downtime and add to total downtime
-                if (vehicleImpact.toString == 'Monitor'):
-                    downtimeIntervals.append([downDate, changeDate, vehicle])
-                    print(issue.key, "\t", vehicle, "\t", downDate, "\t", changeDate)
+                # mark the transition from non-auto ready to auto-ready
+                elif downSeconds is not None:
+                    addInterval(record, downSeconds, changeSeconds)
+                initialCondition, downSeconds = False, None
+
+            # catch when cars are made non-auto ready in ticket history when the change occurs after the start of the period of interest
+            elif vehicleImpact in config.nonAutoStates:
+                initialCondition = False
+                downSeconds = changeSeconds if downSeconds is None else downSeconds
 
         # at this point we have checked the whole history of a particular vehicle for a change in state. Now check if car was created and closed in non-auto ready state, and if so, add to fleetInterval
-        vehicleImpact = issue.fields.customfield_10064.value
-        if vehicleImpact in config.nonAutoStates:
-            upDate = createDatetimeObject(changelog[-1].created, 'end')
-            downDate = createDatetimeObject(changelog[0].created, 'start')
-            downtimeIntervals.append([downDate, upDate, vehicle])
-            print(issue.key, "\t", vehicle, "\t", downDate, "\t", upDate)
+        if record.vehicleImpact in config.nonAutoStates and record.firstChange is not None:
+            addInterval(record, clamp(record.firstChange), clamp(record.lastChange))
 
-    return downtimeIntervals
+    instrumentation.increment('intervals', len(downtimeIntervals))
+    return downtimeIntervals.build()
 
 """
-Computes the sum of accrued downtimes as provided in the list intervals.
+Applies the site's auto readiness definition (config.autoReadiness) to the number of down vehicles per class. 
 
-INPUT: A list of lists, where each elem represents a specific vehicle's downtime interval, and has the form [start downtime (pd.Timestamp), end downtime (pd.Timestamp), vehicle name (str) ]
-OUTPUT: A sum of all accrued downtime over all intervals.
+INPUT: a dict mapping each vehicle class ('Lexus', 'WAMs') to the number of down vehicles of that class, as ints or as NumPy arrays
+OUTPUT: True (or a boolean array) where the site is auto ready
+"""
+def checkAutoReadiness(down: dict):
+    return config.getAutoReadiness(args.site)(down)
 
-The main logic that determines auto readiness is applied here.
+"""
+Sweeps the intervals in time order (see tracker/readiness.py) to build the site's concurrency timeline: the number of concurrently down vehicles of each class over every stretch of time.
+"""
+def buildSiteTimeline(intervals: IntervalTable):
+    return buildTimeline(intervals.starts, intervals.ends, intervals.vehicleCodes,
+                         [config.getVehicleClass(args.site, vehicle) for vehicle in intervals.vehicles],
+                         config.vehicleClasses)
 
-TODO: Add seperate functions for the WAMs and non-WAMs cases to make this function more readable.
 """
-def computeDowntime(intervals: list) -> int:
+Computes the sum of accrued downtimes as provided in the interval table.
+
+INPUT: An IntervalTable, as returned by generateDowntimeIntervals, where each row represents a specific vehicle's downtime interval
+OUTPUT: A sum of all accrued downtime over all intervals, in seconds.
+
+Downtime accrues over every stretch of site operating time of the timeline (see buildSiteTimeline) where checkAutoReadiness fails. 
+"""
+def computeDowntime(intervals: IntervalTable) -> int:
     if len(intervals) == 0:
-        return Timedelta(value=0, unit='seconds').seconds
-
-    intervals.sort(key = lambda x: x[0]) # sort intervals in ascending chronologically updated order, based on the start bound
-    prevEnd = intervals[0][1]
-    previousWamsEnd = Timestamp(config.getQuarter(args.quarter)[0])
-    previousVehicle = intervals[0][2]
-    deltaWAMs = Timedelta(0, unit='seconds')
-    downTime = Timedelta(value=0, unit='seconds')
-    overlappingIntervals = []
-    WAMs = config.mayFleet[args.site][-1]
-    SECONDS_IN_DAY = 86400
+        return 0
 
     print("Computing site auto readiness...")
+    return accruedDowntime(buildSiteTimeline(intervals), checkAutoReadiness, siteCalendar(args.site, *periodOfInterest()))
 
-    # check if first vehicle in list is WAMs and add downtime as needed
-    if intervals[0][2] == WAMs:
-        downTime += computeTimeDelta(intervals[0][0], intervals[0][1])
-        previousWamsEnd = intervals[0][1]
+"""
+Computes the total downtime together with where it came from, from a single sweep over the intervals: the cumulative downtime curve of the timeline (tracker/readiness.py) is built once, and every breakdown is read off it with binary searches.
 
-    for currStart, currEnd, vehicle in intervals[1:]:
+INPUT: 
+    - intervals: an IntervalTable, as returned by generateDowntimeIntervals
+    - frequency: 'day' or 'hour' for a readiness time series, or None
+    - topN: how many of the worst tickets and vehicles to rank
+OUTPUT: a dict with
+    - 'downtime': the total downtime in seconds, as returned by computeDowntime
+    - 'series': a DataFrame with the operating time, downtime and auto readiness of every day or hour the site was open, or None
+    - 'tickets': up to topN [key, vehicle, downtime in hours] rows, worst first. A ticket's downtime is its vehicle's share of the downtime while the ticket was open (see downtimeShares in tracker/readiness.py)
+    - 'vehicles': up to topN [vehicle, downtime in hours] rows, worst first. The shares of all the vehicles add up to the total downtime
+"""
+def computeDowntimeBreakdown(intervals: IntervalTable, frequency: str, topN: int) -> dict:
+    print("Computing site auto readiness...")
+    calendar = siteCalendar(args.site, *periodOfInterest())
+    timeline = buildSiteTimeline(intervals)
+    curve = DowntimeCurve(timeline, checkAutoReadiness, calendar)
+    breakdown = {'downtime': curve.total, 'series': None, 'tickets': [], 'vehicles': []}
+
+    if frequency is not None:
+        periods, operating, downtime = downtimeSeries(curve, 86400 if frequency == 'day' else 3600)
+        isOpen = operating > 0
+        breakdown['series'] = DataFrame({
+            'Period': periods[isOpen].astype('datetime64[s]'),
+            'Operating (h)': operating[isOpen] / 3600,
+            'Downtime (h)': downtime[isOpen] / 3600,
+            'Auto readiness (%)': (operating[isOpen] - downtime[isOpen]) / operating[isOpen] * 100,
+        })
+
+    if topN > 0 and len(intervals) > 0:
+        curves = downtimeShares(timeline, checkAutoReadiness, calendar)
+        vehicleClasses = [config.getVehicleClass(args.site, vehicle) for vehicle in intervals.vehicles]
+        keys, firstRows, ticketIndex = np.unique(intervals.keys.astype(str), return_index=True, return_inverse=True)
+        ticketVehicles = intervals.vehicleCodes[firstRows] # every interval of a ticket is for the ticket's vehicle
+        ticketImpact = attributedImpact(curves, intervals.starts, intervals.ends, ticketIndex, [vehicleClasses[code] for code in ticketVehicles])
+        breakdown['tickets'] = [[str(key), intervals.vehicles[ticketVehicles[np.searchsorted(keys, key)]], seconds / 3600] for key, seconds in topImpacts(keys, ticketImpact, topN)]
+        vehicleSeconds = attributedImpact(curves, intervals.starts, intervals.ends, intervals.vehicleCodes, vehicleClasses)
+        breakdown['vehicles'] = [[vehicle, seconds / 3600] for vehicle, seconds in topImpacts(intervals.vehicles, vehicleSeconds, topN)]
+
+    return breakdown
 
-        if vehicle == WAMs:
-            # if current WAMs downtime interval overlaps previous WAMs interval, find difference between two time deltas
-            if currStart <= previousWamsEnd:
-                deltaWAMs = computeTimeDelta(currStart, currEnd) - deltaWAMs
-            # else, current WAMs interval does not overlap with previous, so just add the whole interval block to downtime
-            else:
-                deltaWAMs = computeTimeDelta(currStart, currEnd)
+"""
+Prints the time series and worst offender rankings of computeDowntimeBreakdown, where requested.
+"""
+def printBreakdown(breakdown: dict):
+    if breakdown['series'] is not None:
+        print(breakdown['series'].to_string(index=False))
+    if len(breakdown['tickets']) > 0:
+        print("Tickets with the greatest downtime impact:")
+        print(DataFrame(breakdown['tickets'], columns=['Ticket', 'Vehicle', 'Downtime (h)']).to_string(index=False))
+    if len(breakdown['vehicles']) > 0:
+        print("Vehicles with the greatest downtime impact:")
+        print(DataFrame(breakdown['vehicles'], columns=['Vehicle', 'Downtime (h)']).to_string(index=False))
 
-            downTime += deltaWAMs
-            print(f"Start: {currStart} End: {min(previousWamsEnd, currEnd)} Delta: {deltaT} Downtime: {downTime} Vehicle: {vehicle} Previous Vehicle: {previousVehicle})")
-            previousWamsEnd = max(currEnd, previousWamsEnd)
-            continue
+"""
+Returns the auto readiness definition that allows up to maxDown Lexus down at once, as long as the WAMs are up.
+"""
+def maxLexusDown(maxDown: int):
+    return lambda down: (down['Lexus'] <= maxDown) & (down['WAMs'] == 0)
+
+"""
+Evaluates the --what-if grid: every combination of readiness definition (--lexus-down, or the site's own), operating hours (--hours, or the site's own) and set of tickets left out (none, and each --without set), over the intervals fetched once. All scenarios share one timeline and are scored in a single vectorized pass (see tracker/scenarios.py), so adding scenarios costs no Jira requests.
+
+INPUT: an IntervalTable, as returned by generateDowntimeIntervals
+OUTPUT: a DataFrame with one row per scenario: definition, hours, tickets left out, downtime in hours and auto readiness percent
+"""
+def computeScenarios(intervals: IntervalTable) -> DataFrame:
+    if args.lexus_down:
+        definitions = [('Lexus <= {0}, WAMs up'.format(maxDown), maxLexusDown(maxDown)) for maxDown in args.lexus_down]
+    else:
+        definitions = [('site definition', config.getAutoReadiness(args.site))]
+    hours = [config.getSiteHours(args.site)]
+    if args.hours:
+        hours = [tuple(int(hour) for hour in span.split('-')) for span in args.hours]
+        assert all(len(span) == 2 and 0 <= span[0] < span[1] <= 24 for span in hours), "--hours must be given as OPEN-CLOSE, e.g. 8-20"
+    exclusions = [set()] + [{key.strip() for key in keys.split(',') if key.strip()} for keys in args.without or []]
+
+    print("Evaluating {0} what-if scenarios...".format(len(definitions) * len(hours) * len(exclusions)))
+    start, end = periodOfInterest()
+    calendars = [siteCalendar(args.site, start, end, span) for span in hours]
+    timeline = scenarioTimeline(intervals, [config.getVehicleClass(args.site, vehicle) for vehicle in intervals.vehicles], config.vehicleClasses, exclusions)
+    downtime = scenarioDowntime(timeline, [isAutoReady for _, isAutoReady in definitions], calendars)
+
+    rows = []
+    for d, (name, _) in enumerate(definitions):
+        for x, excluded in enumerate(exclusions):
+            for h, (openHour, closeHour) in enumerate(hours):
+                operating = calendars[h].totalSeconds()
+                rows.append([name, '{0}-{1}'.format(openHour, closeHour), ', '.join(sorted(excluded)) or '-', downtime[d, x, h] / 3600, None if operating == 0 else (operating - downtime[d, x, h]) / operating * 100])
+    return DataFrame(rows, columns=['Definition', 'Hours', 'Left out', 'Downtime (h)', 'Auto readiness (%)'])
 
-        # if current interval's start value is less than previous interval's end, then intervals overlap, so downtime is accruing. The overlap interval is [currStart, min(prevEnd, currEnd)]
-        if currStart < prevEnd:
-            overlap = [currStart, min(prevEnd, currEnd)]
-            overlappingIntervals.append(overlap)
-            n = len(overlappingIntervals)
-            
-            # exclude cases where both overlapping intervals are for same car, and where the interval we accrue for has matching bounds (really, no downtime accrued)
-            if vehicle != previousVehicle and currStart != currEnd: 
-
-                # check that current interval start bound isn't less than any previously accounted for end bounds, then compute relevant time delta
-                newStart = currStart
-                if n < 1:
-                    newStart = max([x[1] for x in overlappingIntervals[ : n - 1]])    
-                if currStart < newStart:
-                    deltaT = computeTimeDelta(newStart, min(prevEnd, currEnd)) 
-                    print(f"Start: {newStart} End: {min(previousWamsEnd, currEnd)} Delta: {deltaT} Downtime: {downTime} Vehicle: {vehicle} Previous Vehicle: {previousVehicle})")
-                else:
-                    deltaT = computeTimeDelta(currStart, min(prevEnd, currEnd))
-                    print(f"Start: {currStart} End: {min(previousWamsEnd, currEnd)} Delta: {deltaT} Downtime: {downTime} Vehicle: {vehicle} Previous Vehicle: {previousVehicle})")
-                downTime += deltaT
-                
-        # preserve interval with greater end bound
-        prevEnd = max(currEnd, prevEnd)
-
-        # if the larger datetime is the same as the current interval end datetime, update previous vehicle to current vehicle
-        if prevEnd == currEnd:
-            previousVehicle = vehicle
-        
-    return downTime.seconds + downTime.days * SECONDS_IN_DAY
-
-"""
-Given an integer value downtime in seconds, compute and return the percent auto readiness as a float.
-"""
-def computeAutoReadyPercent(downtime: int) -> int:
+"""
+Given an integer value downtime in seconds, compute and return the percent auto readiness as a float, or None if the site had no operating time in the period of interest (e.g. a --rolling 1 window on a weekend, or before the site opens), as the readiness service does.
+"""
+def computeAutoReadyPercent(downtime: int) -> float:
     totalTime = computeTotalTime()
+    if totalTime == 0:
+        return None
     return ((totalTime - downtime)/totalTime) * 100
 
 """
 At the time of writing this program, the Jira API GET methods are limited to a maximum of 100 results per call, so a workaround like this is necessary to collect all issues related to the JQL for the site in cases where the number of issues exceeds 100. 
-INPUT: a Jira server instance, defined in the main function
-OUTPUT: a list of jira issues that results from a JQL search defined by buildJQL()
+
+In the default 'embedded' fetch mode each page is requested with expand=changelog and only the fields in ISSUE_FIELDS, so the issue histories arrive with the search results and the number of requests scales with the number of pages rather than the number of issues.
+
+The first page gives the total number of matching issues, so the remaining pages are requested all at once on a thread pool (see tracker/pagination.py). At most config.maxConcurrentRequests are in flight, fewer while Jira is answering 429 Too Many Requests. Pages are yielded as soon as they arrive, in no particular order.
+
+With raw=True the pages are requested with json_result=True, so the jira module hands back the decoded JSON without building an Issue object per result.
+INPUT: a Jira server instance, the JQL query (defaults to buildJQL()), whether an empty result is acceptable, and whether to return raw JSON
+OUTPUT: a generator of pages, each a list of jira issues (raw Jira issue dicts if raw is set)
 """
-def getRelatedIssues(jira: JIRA) -> list:
+def iterRelatedIssues(jira: JIRA, jql: str = None, allowEmpty: bool = False, raw: bool = False):
     numResults = 100
-    relatedIssues = jira.search_issues(jql_str=buildJQL(), maxResults = numResults, startAt = 0)
-    assert len(relatedIssues) > 0, "API did not return any Jira issues for JQL {0}".format(buildJQL())
-    idx = numResults
+    jql = jql or buildJQL()
+    expand = 'changelog' if args.fetch_mode == 'embedded' else None
+    limiter = requestLimiter(jira)
+    searchPage = lambda startAt: jira.search_issues(jql_str=jql, maxResults = numResults, startAt = startAt, fields = ISSUE_FIELDS, expand = expand, json_result = raw)
+    pageIssues = (lambda page: page['issues']) if raw else (lambda page: page)
     print("Fetching relevant JIRA tickets for site {0}".format(args.site))
-    
-    while True:
-        if len(relatedIssues) % numResults == 0:
-            relatedIssues += jira.search_issues(jql_str=buildJQL(), maxResults = numResults, startAt = idx)
-            idx += numResults
-        else:
-            return relatedIssues
+
+    firstPage = callWithBackoff(searchPage, 0, limiter)
+    total = firstPage['total'] if raw else firstPage.total
+    firstPage = pageIssues(firstPage)
+    assert allowEmpty or len(firstPage) > 0, "API did not return any Jira issues for JQL {0}".format(jql)
+    instrumentation.increment('searchPages')
+    yield firstPage
+
+    # the server may cap the page size below numResults, so step by the size of the page it actually returned
+    if 0 < len(firstPage) < total:
+        for page in fetchConcurrently(searchPage, range(len(firstPage), total, len(firstPage)), limiter):
+            instrumentation.increment('searchPages')
+            yield pageIssues(page)
+
+"""
+The fast path through iterRelatedIssues: requests raw JSON pages and reduces each issue to an IssueRecord (see tracker/issueRecords.py) as soon as its page arrives, so no jira Resource objects are built and each raw page can be released once it has been parsed. Records are a few hundred bytes each, against tens of kilobytes for an issue object with its changelog.
+INPUT: a Jira server instance, the JQL query (defaults to buildJQL()), and whether an empty result is acceptable
+OUTPUT: a generator of IssueRecords
+"""
+def iterIssueRecords(jira: JIRA, jql: str = None, allowEmpty: bool = False):
+    for page in instrumentation.timedIterator('fetch', iterRelatedIssues(jira, jql, allowEmpty, raw=True)):
+        for issue in page:
+            yield issueRecord(issue, getRawChangelog(issue, jira))
+
+"""
+Collects iterIssueRecords into one list of IssueRecords.
+"""
+def getIssueRecords(jira: JIRA, jql: str = None, allowEmpty: bool = False) -> list:
+    return list(iterIssueRecords(jira, jql, allowEmpty))
+
+"""
+Returns the raw JSON of every issue matching the JQL in compact form (see tracker/issueCache.py), with complete changelogs.
+"""
+def getCompactIssues(jira: JIRA, jql: str = None, allowEmpty: bool = False) -> list:
+    return [compactIssue(issue, getRawChangelog(issue, jira)) for page in iterRelatedIssues(jira, jql, allowEmpty, raw=True) for issue in page]
+
+"""
+Returns the issues for the site and period of interest from the local issue cache (config.cacheFile). Unless running --offline, the cache is first brought up to date: only issues updated since the last sync of this site over the period (or over any synced period starting no later, see IssueCache.lastSync) are requested from Jira, including issues last updated after the period ended (see buildJQL), and they are merged into the cache together with their complete changelogs.
+
+JQL compares updatedDate in the Jira user's timezone with minute precision, while the high-water mark is kept in UTC, so the delta query starts one day before the mark. Re-fetching that overlap is cheap and merging is idempotent.
+INPUT: a Jira server instance, or None when running --offline, and whether a period without any issues is acceptable
+OUTPUT: a list of compact issues (see tracker/issueCache.py) with their complete changelogs embedded. Use issueRecord to pass them to generateDowntimeIntervals
+"""
+def getCachedIssues(jira: JIRA, allowEmpty: bool = False) -> list:
+    cache = IssueCache(config.cacheFile)
+    startQuarter, endQuarter = periodOfInterest()
+    lastSync = cache.lastSync(args.site, startQuarter)
+
+    if args.offline:
+        assert lastSync is not None, "Site {0} {1} has not been synced to {2} yet, so it cannot be computed offline".format(args.site, periodLabel(), config.cacheFile)
+    else:
+        syncTime = Timestamp.utcnow().tz_localize(None)
+        updatedSince = None if lastSync is None else (Timestamp(lastSync) - Timedelta(days=1)).strftime('%Y-%m-%d %H:%M')
+        updatedIssues = getCompactIssues(jira, buildJQL(updatedSince=updatedSince, excludeIssues=False, openEnded=True), allowEmpty=True)
+        cache.storeIssues(args.site, updatedIssues)
+        cache.markSynced(args.site, startQuarter, syncTime.isoformat())
+        print("Synced {0} updated JIRA tickets to {1}".format(len(updatedIssues), config.cacheFile))
+
+    excluded = {key.strip() for key in args.exclude.split(',') if key.strip()}
+    relatedIssues = [issue for issue in cache.loadIssues(args.site, startQuarter, endQuarter) if issue['key'] not in excluded]
+    assert allowEmpty or len(relatedIssues) > 0, "No Jira issues cached for site {0} {1}".format(args.site, periodLabel())
+    return relatedIssues
+
+"""
+Returns the full history of a raw Jira issue dict in ascending datetime order, as raw dicts.
+
+If the issue was fetched with its changelog embedded, the embedded histories are used directly. Jira truncates embedded changelogs for tickets with long histories; the changelog's startAt/total fields tell us which slice we received, so only the histories outside that slice are requested. Issues fetched without a changelog have their whole changelog requested.
+"""
+@instrumentation.timed('getRawChangelog')
+def getRawChangelog(issue: dict, jira: JIRA) -> list:
+    changelog = issue.get('changelog')
+    if changelog is None:
+        histories = fetchRawChangelogRange(jira, issue['key'], 0, None)
+    else:
+        histories = list(changelog['histories'])
+        start = changelog.get('startAt', 0)
+        total = changelog.get('total', len(histories))
+        embeddedEnd = start + len(histories)
+        if len(histories) < total:
+            histories += fetchRawChangelogRange(jira, issue['key'], 0, start)
+            histories += fetchRawChangelogRange(jira, issue['key'], embeddedEnd, total)
+
+    uniqueHistories = {int(history['id']): history for history in histories}
+    instrumentation.increment('histories', len(uniqueHistories))
+    return [uniqueHistories[historyId] for historyId in sorted(uniqueHistories)]
+
+"""
+Fetches the histories at positions [start, stop) of an issue's changelog as raw dicts. A stop of None reads to the end of the changelog. Each page is requested through callWithBackoff under the server's shared limiter (see requestLimiter), so a throttled or transiently failing changelog request is retried like a search page.
+"""
+def fetchRawChangelogRange(jira: JIRA, key: str, start: int, stop: int) -> list:
+    histories = []
+    changelogPage = lambda params: jira._get_json('issue/{0}/changelog'.format(key), params=params)
+    while stop is None or start < stop:
+        page = callWithBackoff(changelogPage, {'startAt': start, 'maxResults': 100 if stop is None else min(100, stop - start)}, requestLimiter(jira))
+        values = page.get('values', [])
+        if len(values) == 0:
+            break
+        histories += values
+        start += len(values)
+        stop = page.get('total', start) if stop is None else stop
+    return histories
 
 """
 Uses the arguments provided to build the JQL query used by the Jira GET API method. Returns the query.
+
+If updatedSince ('YYYY-MM-DD HH:MM') is given, only issues updated at or after that time are matched. The cache sync leaves out the --exclude filter (excludeIssues=False) so that excluded issues are still cached, and drops them locally instead. It also leaves out the end of the period (openEnded=True): an issue updated again after the period ends must still be re-fetched, or its stale copy in the cache would keep counting towards the period.
 """
-def buildJQL() -> str:
+def buildJQL(updatedSince: str = None, excludeIssues: bool = True, openEnded: bool = False) -> str:
     assert args.site in config.mayFleet.keys(), "The site name must match one of the keys in the mayFleet hashmap"
-    startQuarter, endQuarter = config.getQuarter(args.quarter)
+    startQuarter, endQuarter = periodOfInterest()
 
     # check if jira issues to exclude were provided as arguments
-    if not args.exclude:
+    if not args.exclude or not excludeIssues:
         issuesToExclude = ""
     else:
         issuesToExclude = "AND id NOT IN ({0})".format(args.exclude)
+
+    updatedFilter = 'AND updatedDate >= "{0}"'.format(updatedSince) if updatedSince else ""
+    endFilter = "" if openEnded else 'AND updatedDate <= "{0}"'.format(endQuarter)
     
-    query = 'project IN ("{0}") AND updatedDate >= "{1}" AND updatedDate <= "{2}" AND statusCategory in ("New", "In Progress", "Complete") AND type IN ("Fix On Site","Preventative Maintenance","Support Request") {3} ORDER BY created DESC'.format(args.site, startQuarter, endQuarter, issuesToExclude)
+    query = 'project IN ("{0}") AND updatedDate >= "{1}" {2} {3} AND statusCategory in ("New", "In Progress", "Complete") AND type IN ("Fix On Site","Preventative Maintenance","Support Request") {4} ORDER BY created DESC'.format(args.site, startQuarter, endFilter, updatedFilter, issuesToExclude)
     return query
 
 """
-Returns the start of the quarter datetime and end of quarter datetime as pandas Timestamp objects.
+Returns the start and end datetimes of the period of interest (see periodOfInterest) as pandas Timestamp objects.
 """
 def dateTimeRange() -> Timestamp:
-    startQuarter, endQuarter = config.getQuarter(args.quarter)
+    startQuarter, endQuarter = periodOfInterest()
     return [to_datetime(startQuarter).tz_localize(None), to_datetime(endQuarter).tz_localize(None)]
 
+"""
+Fetches the issue records (see tracker/issueRecords.py) for the selected site and period, through the local cache unless --no-cache was given. Without the cache, records are streamed page by page as they arrive, so interval generation overlaps with the remaining requests.
+"""
+def fetchIssues(jira: JIRA):
+    if args.no_cache:
+        return iterIssueRecords(jira)
+    with instrumentation.stage('fetch'):
+        return [issueRecord(issue, issue['changelog']['histories']) for issue in getCachedIssues(jira)]
+
+"""
+Worker for batch runs: computes the downtime of one (site, quarter) pair in a process of the pool started by runBatch. 
+
+INPUT: a (workerArgs, issues) tuple, where workerArgs is a copy of the args namespace with the site and quarter selected, and issues is a list of compact issues (tracker/issueCache.py) with complete changelogs, so no Jira connection is needed
+OUTPUT: one row of the batch results table, and the instrumentation counters (e.g. issues and intervals) recorded while computing it, which would otherwise be lost with the worker process
+"""
+def computeSiteQuarter(task: tuple) -> tuple:
+    global args
+    args, issues = task
+    if args.profile:
+        instrumentation.enable()
+    # a forked worker starts with the counters of the parent process and keeps those of its earlier pairs, so only what this pair adds is returned
+    before = instrumentation.counters()
+    relatedIssues = [issueRecord(issue, issue['changelog']['histories']) for issue in issues]
+    intervals = generateDowntimeIntervals(relatedIssues, dateTimeRange())
+    if args.output:
+        stem, extension = os.path.splitext(args.output)
+        intervals.export("{0}-{1}-{2}{3}".format(stem, args.site, periodLabel(), extension))
+    downtime = computeDowntime(intervals)
+    counters = {name: amount - before.get(name, 0) for name, amount in instrumentation.counters().items()}
+    return [args.site, periodLabel(), len(relatedIssues), len(intervals), round(downtime / 3600, 2), computeAutoReadyPercent(downtime)], counters
+
+"""
+Returns the issues of the selected site and quarter in compact form (see tracker/issueCache.py), with complete changelogs, through the local cache unless --no-cache was given.
+"""
+def fetchCompactIssues(jira: JIRA, allowEmpty: bool = False) -> list:
+    if args.no_cache:
+        return getCompactIssues(jira, allowEmpty=allowEmpty)
+    return getCachedIssues(jira, allowEmpty)
+
+"""
+Computes every requested (site, quarter) pair in one invocation. Issues are fetched in this process over a single Jira connection (or read from the cache), then the interval generation and downtime computation of each pair is fanned out to a pool of --jobs worker processes, whose instrumentation counters are added up here. Prints one combined table of the results. A pair without any issues (e.g. a quarter that hasn't started yet) gets a row with no intervals and 100% auto readiness rather than stopping the batch.
+"""
+def runBatch():
+    jira = None if args.offline else createServerInstance()
+    tasks = []
+    for site in args.sites:
+        for quarter in args.quarters:
+            selectSiteQuarter(site, quarter)
+            with instrumentation.stage('fetch'):
+                tasks.append((argparse.Namespace(**vars(args)), fetchCompactIssues(jira, allowEmpty=True)))
+
+    with instrumentation.stage('compute'), ProcessPoolExecutor(max_workers=min(args.jobs, len(tasks))) as executor:
+        results = []
+        for row, counters in executor.map(computeSiteQuarter, tasks):
+            results.append(row)
+            for name, amount in counters.items():
+                instrumentation.increment(name, amount)
+
+    print(DataFrame(results, columns=['Site', 'Period', 'Issues', 'Intervals', 'Downtime (h)', 'Auto readiness (%)']).to_string(index=False))
+
+"""
+Generates the downtime intervals of a list of compact issues over a window of two 'YYYY-MM-DD' dates. Used by the readiness service to (re)build intervals.
+"""
+def serviceIntervals(issues: list, window: tuple) -> IntervalTable:
+    return generateDowntimeIntervals([issueRecord(issue, issue['changelog']['histories']) for issue in issues], [to_datetime(window[0]), to_datetime(window[1])])
+
+"""
+Runs the readiness service (tracker/service.py). The issues of every requested site are loaded once, for every quarter from the first to the last requested (or for the --range or --rolling period), and kept in memory along with their intervals and interval index; queries for any date range within that window are then answered without contacting Jira, and Jira webhooks keep the store up to date.
+"""
+def runService():
+    jira = None if args.offline else createServerInstance()
+    quarters = args.quarters if args.range is not None else list(range(min(args.quarters), max(args.quarters) + 1))
+    issuesBySite = {}
+    for site in args.sites:
+        issues = {}
+        for quarter in quarters:
+            selectSiteQuarter(site, quarter)
+            issues.update({issue['key']: issue for issue in fetchCompactIssues(jira)})
+        issuesBySite[site] = list(issues.values())
+
+    selectSiteQuarter(args.sites[0], quarters[0])
+    window = (periodOfInterest()[0], config.getQuarter(quarters[-1])[1] if args.range is None else args.range[1])
+    if args.rolling is not None:
+        window = (window[0], (Timestamp(window[1]).normalize() + Timedelta(days=1)).strftime('%Y-%m-%d')) # keep the rest of today, for queries made later while the service runs
+    store = ReadinessStore(issuesBySite, window, serviceIntervals)
+    if args.replay:
+        with open(args.replay) as replay:
+            updated = [store.applyWebhook(json.loads(line)) for line in replay if line.strip()]
+        print("Replayed {0} webhook payloads from {1}".format(len(updated), args.replay))
+    serve(store, args.serve)
+
+"""
+Writes the instrumentation report (see tracker/instrumentation.py) for this run to the --profile file.
+"""
+def writeProfile():
+    report = instrumentation.report()
+    report['run'] = {'sites': args.sites, 'quarters': args.quarters, 'range': args.range, 'fetchMode': args.fetch_mode, 'cache': not args.no_cache, 'offline': args.offline, 'finishedAt': Timestamp.now().isoformat()}
+    with open(args.profile, 'w') as file:
+        json.dump(report, file, indent=2)
+    print("Wrote profile report to {0}".format(args.profile))
+
 def main():
     parseArgs()
-    dateRange = dateTimeRange()
-    jira = createServerInstance()
-    relatedIssues = getRelatedIssues(jira)
-    intervals = generateDowntimeIntervals(relatedIssues, jira, dateRange)
-    downtime = computeDowntime(intervals)
-    autoReadyPercent = computeAutoReadyPercent(downtime)
-    print("Auto readiness is {0}".format(autoReadyPercent))
+    if args.profile:
+        instrumentation.enable(hotPaths=args.profile_hot_paths)
+    if args.serve is not None:
+        runService()
+        return
+    if len(args.sites) * len(args.quarters) > 1:
+        with instrumentation.stage('total'):
+            runBatch()
+        if args.profile:
+            writeProfile()
+        print('End program')
+        return
+
+    with instrumentation.stage('total'):
+        dateRange = dateTimeRange()
+        with instrumentation.stage('connect'):
+            jira = None if args.offline else createServerInstance()
+        relatedIssues = fetchIssues(jira)
+        with instrumentation.stage('intervals'):
+            intervals = generateDowntimeIntervals(relatedIssues, dateRange)
+        if args.output:
+            with instrumentation.stage('export'):
+                intervals.export(args.output)
+            print("Wrote {0} downtime intervals to {1}".format(len(intervals), args.output))
+        if args.what_if:
+            with instrumentation.stage('scenarios'):
+                print(computeScenarios(intervals).to_string(index=False))
+        with instrumentation.stage('downtime'):
+            if args.series or args.top > 0:
+                breakdown = computeDowntimeBreakdown(intervals, args.series, args.top)
+                printBreakdown(breakdown)
+                downtime = breakdown['downtime']
+            else:
+                downtime = computeDowntime(intervals)
+            autoReadyPercent = computeAutoReadyPercent(downtime)
+    if autoReadyPercent is None:
+        print("Site {0} has no operating hours in {1}, so its auto readiness is undefined".format(args.site, periodLabel()))
+    else:
+        print("Auto readiness is {0}".format(autoReadyPercent))
+    if args.profile:
+        writeProfile()
     print('End program')
     
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
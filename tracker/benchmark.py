@@ -0,0 +1,141 @@
+"""
+
+Benchmark suite for jira-tracker.py, run entirely offline against tracker/fakeJira.py.
+
+For each fleet size, synthetic tickets are generated for the site and quarter (tracker/syntheticFleet.py) and the pipeline stages are timed separately: getIssueRecords, generateDowntimeIntervals, computeDowntime, and computeTimeDelta over every interval. The number of requests made to the fake server is reported, and the computed downtime is checked against the brute force ground truth, for the chosen site at every size and for every other site of config.mayFleet at one size (their fleets differ, e.g. in the spelling of vehicle names). A cached run is also checked against a --no-cache run (see checkCache), and the --top vehicle rankings are checked to account for every second of downtime (see checkAttribution). The exit status is non-zero if any size disagrees with the ground truth, or either check fails.
+
+Usage, from the repository root:
+    python -m tracker.benchmark -s AA -q 1 -n 10 100 1000 10000 100000
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+from pandas import DataFrame, Timestamp, Timedelta
+
+import config.config as config
+from tracker.fakeJira import FakeJira
+from tracker.issueCache import IssueCache
+from tracker.syntheticFleet import generateTickets, groundTruthDowntime, TIME_FORMAT
+
+"""
+Imports jira-tracker.py, which can't be imported by name because of the hyphen.
+"""
+def loadTracker():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'jira-tracker.py')
+    spec = importlib.util.spec_from_file_location('jiraTracker', path)
+    tracker = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tracker)
+    return tracker
+
+"""
+Calls function(*arguments) with its console output discarded. Returns the result and the wall clock time taken, in seconds.
+"""
+def timed(function, *arguments) -> tuple:
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        begin = time.perf_counter()
+        result = function(*arguments)
+        elapsed = time.perf_counter() - begin
+    return result, elapsed
+
+"""
+Runs every stage of the pipeline on numTickets synthetic tickets and returns one row of the results table.
+"""
+def runBenchmark(tracker, site: str, quarter: int, numTickets: int, seed: int, latency: float, concurrencyLimit: int) -> list:
+    start, end = config.getQuarter(quarter)
+    issues, truth = generateTickets(site, numTickets, start, end, seed)
+    jira = FakeJira(issues, latency, concurrencyLimit=concurrencyLimit, retryAfter=latency)
+    tracker.parseArgs(['-s', site, '-q', str(quarter), '--no-cache'])
+
+    relatedIssues, fetchTime = timed(tracker.getIssueRecords, jira)
+    intervals, intervalTime = timed(tracker.generateDowntimeIntervals, relatedIssues, tracker.dateTimeRange())
+    downtime, downtimeTime = timed(tracker.computeDowntime, intervals)
+    _, deltaTime = timed(lambda: [tracker.computeTimeDelta(intervalStart, intervalEnd) for intervalStart, intervalEnd in zip(intervals.starts, intervals.ends)])
+    expected = groundTruthDowntime(site, truth, start, end)
+
+    return [numTickets, len(intervals), jira.requestCount, fetchTime, intervalTime, downtimeTime, deltaTime, downtime, expected, downtime == expected]
+
+"""
+Regression check for the issue cache: a cached run must agree with a --no-cache run after tickets of the quarter are updated again once the quarter is over. The quarter is synced to a scratch cache as if at its end, a third of its tickets then get a status change after the end of the quarter (which moves them out of the quarter's JQL), and the quarter is computed again through the cache and without it.
+
+OUTPUT: (cached downtime, --no-cache downtime), in seconds
+"""
+def checkCache(tracker, site: str, quarter: int, numTickets: int, seed: int) -> tuple:
+    start, end = config.getQuarter(quarter)
+    issues, _ = generateTickets(site, numTickets, start, end, seed)
+    cacheFile, config.cacheFile = config.cacheFile, os.path.join(tempfile.mkdtemp(), 'cache-check.sqlite3')
+    try:
+        tracker.parseArgs(['-s', site, '-q', str(quarter)])
+        timed(tracker.fetchIssues, FakeJira(issues))
+        IssueCache(config.cacheFile).markSynced(site, start, end)
+
+        laterUpdate = (Timestamp(end) + Timedelta(days=10)).strftime(TIME_FORMAT)
+        for issue in issues[::3]:
+            histories = issue['changelog']['histories']
+            histories.append({'id': str(max(int(history['id']) for history in histories) + 1), 'created': laterUpdate, 'items': [{'field': 'status', 'toString': 'Done'}]})
+            issue['fields']['updated'] = laterUpdate
+        jira = FakeJira(issues)
+
+        results = []
+        for options in ([], ['--no-cache']):
+            tracker.parseArgs(['-s', site, '-q', str(quarter)] + options)
+            records, _ = timed(lambda: list(tracker.fetchIssues(jira)))
+            intervals, _ = timed(tracker.generateDowntimeIntervals, records, tracker.dateTimeRange())
+            results.append(timed(tracker.computeDowntime, intervals)[0])
+        return tuple(results)
+    finally:
+        config.cacheFile = cacheFile
+
+"""
+Check for the --top rankings: the downtime charged to the vehicles (see downtimeShares in tracker/readiness.py) must add up to the total downtime, so that no outage, however many vehicles it involves, drops out of the rankings.
+
+OUTPUT: (downtime charged to the vehicles, total downtime), in seconds
+"""
+def checkAttribution(tracker, site: str, quarter: int, numTickets: int, seed: int) -> tuple:
+    start, end = config.getQuarter(quarter)
+    issues, _ = generateTickets(site, numTickets, start, end, seed)
+    tracker.parseArgs(['-s', site, '-q', str(quarter), '--no-cache'])
+    records, _ = timed(tracker.getIssueRecords, FakeJira(issues))
+    intervals, _ = timed(tracker.generateDowntimeIntervals, records, tracker.dateTimeRange())
+    breakdown, _ = timed(tracker.computeDowntimeBreakdown, intervals, None, len(config.mayFleet[site]))
+    return round(sum(hours for _, hours in breakdown['vehicles']) * 3600), breakdown['downtime']
+
+def main():
+    parser = argparse.ArgumentParser(description='Times each stage of jira-tracker.py on synthetic fleets, against an offline stand-in for the Jira server.')
+    parser.add_argument('-s', '--site', type = str, default="AA", choices=list(config.mayFleet.keys()), help='Site whose fleet is simulated.')
+    parser.add_argument('-q', '--quarter', type = int, default=1, choices=[1,2,3,4], help='Quarter of the year the tickets are spread over.')
+    parser.add_argument('-n', '--tickets', type = int, nargs='+', default=[10, 100, 1000, 10000, 100000], help='Fleet sizes, in number of tickets.')
+    parser.add_argument('--seed', type = int, default=0, help='Random seed for the synthetic tickets.')
+    parser.add_argument('--latency', type = float, default=0.0, help='Simulated round trip time of every request to the fake server, in seconds.')
+    parser.add_argument('--rate-limit', type = int, default=None, help='Number of concurrent requests above which the fake server answers 429 Too Many Requests.')
+    options = parser.parse_args()
+
+    tracker = loadTracker()
+    rows = [runBenchmark(tracker, options.site, options.quarter, numTickets, options.seed, options.latency, options.rate_limit) for numTickets in options.tickets]
+    results = DataFrame(rows, columns=['Tickets', 'Intervals', 'Requests', 'getIssueRecords (s)', 'generateDowntimeIntervals (s)', 'computeDowntime (s)', 'computeTimeDelta (s)', 'Downtime (s)', 'Ground truth (s)', 'Match'])
+    print(results.to_string(index=False))
+
+    mismatches = []
+    for site in config.mayFleet:
+        if site != options.site:
+            downtime, expected, match = runBenchmark(tracker, site, options.quarter, 300, options.seed, 0.0, None)[-3:]
+            print("{0}: {1} s against a ground truth of {2} s, {3}".format(site, downtime, expected, 'match' if match else 'MISMATCH'))
+            if not match:
+                mismatches.append(site)
+
+    cached, uncached = checkCache(tracker, options.site, options.quarter, 300, options.seed)
+    print("Cached and --no-cache runs after updates past the end of the quarter: {0} s and {1} s, {2}".format(cached, uncached, 'match' if cached == uncached else 'MISMATCH'))
+
+    charged, downtime = checkAttribution(tracker, options.site, options.quarter, 300, options.seed)
+    # every vehicle's share is rounded to the second on its own
+    covered = abs(charged - downtime) <= len(config.mayFleet[options.site])
+    print("Downtime charged to the vehicles by --top against the total: {0} s and {1} s, {2}".format(charged, downtime, 'match' if covered else 'MISMATCH'))
+    sys.exit(0 if results['Match'].all() and not mismatches and cached == uncached and covered else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+
+Business calendar for one site over a fixed date range. 
+
+The calendar precomputes, for every day in the range, the number of operating seconds that elapse before that day starts (a prefix sum over business days, excluding weekends and holidays, of the site's daily open hours). The operating time before any timestamp is then that prefix value plus the clipped time since the site opened on the timestamp's day, so the business time between two timestamps is two lookups and a subtraction. All lookups accept NumPy arrays, so a whole list of interval bounds is scored in a single vectorized call.
+
+Timestamps are given as int64 seconds since the epoch, computed from naive (local wall clock) datetimes; see toEpochSeconds.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+import config.config as config
+
+SECONDS_IN_DAY = 86400
+
+"""
+Converts a datetime-like value (pd.Timestamp, datetime, 'YYYY-MM-DD' string) or a sequence of them to int64 epoch seconds. Timezone information must already be stripped.
+"""
+def toEpochSeconds(values):
+    return np.asarray(values, dtype='datetime64[s]').astype(np.int64)
+
+"""
+Converts holidays from the config format "YYYY, MM, DD" to numpy dates.
+"""
+def parseHolidays(holidays: list) -> list:
+    return [np.datetime64('{0:04d}-{1:02d}-{2:02d}'.format(*[int(part) for part in holiday.split(',')])) for holiday in holidays]
+
+class BusinessCalendar:
+
+    """
+    INPUT:
+        - start, end: the date range [start, end) covered by the calendar, as anything numpy.datetime64 accepts (e.g. 'YYYY-MM-DD'). The end may carry a time of day ('YYYY-MM-DD HH:MM', e.g. now, for a rolling window), in which case no operating time accrues after it
+        - openHour, closeHour: the site's daily operating hours, in military time
+        - holidays: list of holidays in the config format "YYYY, MM, DD"
+    """
+    def __init__(self, start, end, openHour: int, closeHour: int, holidays: list = None):
+        firstDay = np.datetime64(start, 'D')
+        lastDay = np.datetime64(end, 'D')
+        if np.datetime64(end, 's') > lastDay:
+            lastDay += np.timedelta64(1, 'D') # the end falls within a day, which is then covered up to the end
+        days = np.arange(firstDay, lastDay)
+        assert len(days) > 0, "Business calendar range [{0}, {1}) is empty".format(start, end)
+
+        self.origin = int(toEpochSeconds(firstDay))
+        self.end = int(toEpochSeconds(np.datetime64(end, 's')))
+        self.numDays = len(days)
+        self.openSecond = openHour * 3600
+        self.dailySeconds = (closeHour - openHour) * 3600
+        self.operatingDays = np.is_busday(days, holidays=parseHolidays(holidays or []))
+
+        # cumulative[d] is the number of operating seconds before day d starts, so cumulative[-1] is the total for the days covered
+        self.cumulative = np.zeros(self.numDays + 1, dtype=np.int64)
+        np.cumsum(self.operatingDays * self.dailySeconds, out=self.cumulative[1:])
+
+    """
+    Returns the number of operating seconds in [start of calendar, t), for an epoch-seconds scalar or array t. Times outside the calendar are clamped to its range.
+    """
+    def secondsBefore(self, t):
+        offset = np.clip(np.asarray(t, dtype=np.int64) - self.origin, 0, self.end - self.origin)
+        day = np.minimum(offset // SECONDS_IN_DAY, self.numDays - 1)
+        secondOfDay = offset - day * SECONDS_IN_DAY
+        withinDay = np.clip(secondOfDay - self.openSecond, 0, self.dailySeconds) * self.operatingDays[day]
+        return self.cumulative[day] + withinDay
+
+    """
+    Returns the number of operating seconds in [start, end), for epoch-seconds scalars or arrays. Intervals with end <= start score zero.
+    """
+    def operatingSeconds(self, start, end):
+        return np.maximum(self.secondsBefore(end) - self.secondsBefore(start), 0)
+
+    """
+    Returns the epoch-seconds edges of consecutive buckets of bucketSeconds covering the calendar's range, from its first midnight up to and including its end. The last bucket is cut short if the range isn't a whole number of buckets.
+    """
+    def bucketEdges(self, bucketSeconds: int):
+        return np.append(np.arange(self.origin, self.end, bucketSeconds, dtype=np.int64), self.end)
+
+    """
+    Returns the total number of operating seconds in the calendar's range.
+    """
+    def totalSeconds(self) -> int:
+        return int(self.secondsBefore(self.end))
+
+"""
+Returns the business calendar of a site over [start, end) (strings, see BusinessCalendar), built from config.holidays and the site's operating hours, or the given (open, close) hours instead. Calendars are built once per (site, range, hours) and reused by every later downtime computation or query.
+"""
+@lru_cache(maxsize=256)
+def siteCalendar(site: str, start: str, end: str, hours: tuple = None) -> BusinessCalendar:
+    openHour, closeHour = hours or config.getSiteHours(site)
+    return BusinessCalendar(start, end, openHour, closeHour, config.holidays)
@@ -0,0 +1,132 @@
+"""
+
+Offline stand-in for the jira.JIRA client, serving a fixed set of issues from memory.
+
+It implements the subset of the client used by jira-tracker.py (search_issues, issue, and the paginated changelog endpoint behind _get_json) and understands the JQL produced by buildJQL: the project, updatedDate bounds and 'id NOT IN' exclusions. Like Jira Cloud, it truncates changelogs embedded in search results to the most recent maxEmbeddedHistories entries.
+
+Every request is counted in requestCount, and can be slowed down by a fixed latency, so that runs against the fake give a realistic picture of how many round trips the pipeline makes. With a concurrencyLimit, requests beyond that many in flight are rejected with 429 Too Many Requests and a Retry-After header, like a rate limited server. Issues are given as raw Jira JSON dicts, e.g. from tracker/syntheticFleet.py or from recorded responses.
+"""
+
+import re
+import threading
+import time
+
+from jira.client import ResultList
+from jira.exceptions import JIRAError
+from requests import Response
+from jira.resources import dict2resource
+from pandas import to_datetime
+
+class FakeJira:
+
+    """
+    INPUT:
+        - issues: list of raw issue dicts ({'key', 'id', 'fields', 'changelog': {'histories'}}), histories in ascending order
+        - latency: seconds to sleep on every request, to emulate the round trip to the server
+        - maxEmbeddedHistories: how many histories a search with expand=changelog embeds per issue
+        - concurrencyLimit: how many requests may be in flight before the fake answers 429, None for no limit
+        - retryAfter: the Retry-After delay, in seconds, sent with 429 responses
+    """
+    def __init__(self, issues: list, latency: float = 0.0, maxEmbeddedHistories: int = 100, concurrencyLimit: int = None, retryAfter: float = 1.0):
+        self.issues = sorted(issues, key=lambda issue: issue['fields']['created'], reverse=True)
+        self.issuesById = {issue['id']: issue for issue in issues}
+        self.issuesById.update({issue['key']: issue for issue in issues})
+        self.updated = {issue['key']: to_datetime(issue['fields']['updated']).tz_localize(None) for issue in issues}
+        self.latency = latency
+        self.maxEmbeddedHistories = maxEmbeddedHistories
+        self.concurrencyLimit = concurrencyLimit
+        self.retryAfter = retryAfter
+        self.requestCount = 0
+        self.throttledCount = 0
+        self.inFlight = 0
+        self.lock = threading.Lock()
+        self.matches = {}
+
+    """
+    Accounts for one request, sleeping for the simulated latency. Raises a 429 JIRAError if too many requests are in flight.
+    """
+    def _request(self):
+        with self.lock:
+            self.requestCount += 1
+            throttled = self.concurrencyLimit is not None and self.inFlight >= self.concurrencyLimit
+            if throttled:
+                self.throttledCount += 1
+            else:
+                self.inFlight += 1
+        if throttled:
+            response = Response()
+            response.status_code = 429
+            response.headers['Retry-After'] = str(self.retryAfter)
+            raise JIRAError(status_code=429, text='Too Many Requests', response=response)
+        try:
+            if self.latency > 0:
+                time.sleep(self.latency)
+        finally:
+            with self.lock:
+                self.inFlight -= 1
+
+    """
+    Returns the issues matching the project, updatedDate and exclusion clauses of the JQL query. Results are kept per query, since the same query is repeated for every page.
+    """
+    def _match(self, jql: str) -> list:
+        with self.lock:
+            if jql not in self.matches:
+                self.matches[jql] = self._filter(jql)
+            return self.matches[jql]
+
+    def _filter(self, jql: str) -> list:
+        projects = re.search(r'project IN \(([^)]*)\)', jql)
+        projects = None if projects is None else {project.strip(' "') for project in projects.group(1).split(',')}
+        excluded = re.search(r'id NOT IN \(([^)]*)\)', jql)
+        excluded = set() if excluded is None else {key.strip(' "') for key in excluded.group(1).split(',')}
+        lowerBounds = [to_datetime(bound) for bound in re.findall(r'updatedDate >= "([^"]+)"', jql)]
+        upperBounds = [to_datetime(bound) for bound in re.findall(r'updatedDate <= "([^"]+)"', jql)]
+
+        matches = []
+        for issue in self.issues:
+            updated = self.updated[issue['key']]
+            if projects is not None and issue['key'].split('-')[0] not in projects:
+                continue
+            if issue['key'] in excluded or any(updated < bound for bound in lowerBounds) or any(updated > bound for bound in upperBounds):
+                continue
+            matches.append(issue)
+        return matches
+
+    """
+    Returns the raw JSON of an issue as the server would send it: only the requested fields, and the changelog when expanded (truncated to the most recent maxEmbedded histories).
+    """
+    def _project(self, issue: dict, fields, expand, maxEmbedded: int) -> dict:
+        if isinstance(fields, str):
+            fields = None if fields in ('*all', '') else fields.split(',')
+        raw = {'key': issue['key'], 'id': issue['id']}
+        raw['fields'] = dict(issue['fields']) if fields is None else {field: issue['fields'].get(field) for field in fields}
+        if expand and 'changelog' in expand:
+            histories = issue['changelog']['histories']
+            start = max(0, len(histories) - maxEmbedded)
+            raw['changelog'] = {'startAt': start, 'maxResults': maxEmbedded, 'total': len(histories), 'histories': histories[start:]}
+        return raw
+
+    def search_issues(self, jql_str: str, startAt: int = 0, maxResults: int = 50, validate_query: bool = True, fields=None, expand=None, properties=None, json_result=None):
+        self._request()
+        matches = self._match(jql_str)
+        page = [self._project(issue, fields, expand, self.maxEmbeddedHistories) for issue in matches[startAt:startAt + maxResults]]
+        if json_result:
+            return {'startAt': startAt, 'maxResults': maxResults, 'total': len(matches), 'issues': page}
+        return ResultList([dict2resource(raw) for raw in page], startAt, maxResults, len(matches))
+
+    def issue(self, id: str, fields=None, expand=None):
+        self._request()
+        issue = self.issuesById[id]
+        return dict2resource(self._project(issue, fields, expand, len(issue['changelog']['histories'])))
+
+    """
+    Serves the paginated changelog endpoint ('issue/<key>/changelog') used to complete truncated changelogs.
+    """
+    def _get_json(self, path: str, params: dict = None, base: str = None):
+        self._request()
+        match = re.fullmatch(r'issue/([^/]+)/changelog', path)
+        assert match is not None, "FakeJira does not serve {0}".format(path)
+        histories = self.issuesById[match.group(1)]['changelog']['histories']
+        params = params or {}
+        start, count = int(params.get('startAt', 0)), int(params.get('maxResults', 100))
+        return {'startAt': start, 'maxResults': count, 'total': len(histories), 'isLast': start + count >= len(histories), 'values': histories[start:start + count]}
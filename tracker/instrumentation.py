@@ -0,0 +1,135 @@
+"""
+
+Built-in instrumentation for jira-tracker.py.
+
+Records, while enabled:
+    - wall clock time and number of calls of named stages (stage context manager and timed decorator). Stages may nest, e.g. 'fetch' time spent waiting on pages that are streamed into 'intervals' is counted in both
+    - counters, e.g. HTTP requests and bytes (see countResponses), retries and backoff time, and the number of issues and intervals
+    - optionally, a cProfile capture of the hottest functions
+
+report() returns everything as a JSON-serializable dict, for tracking across scheduled runs. When disabled (the default), stage, timed and increment cost next to nothing.
+"""
+
+from contextlib import contextmanager
+from functools import wraps
+import cProfile
+import pstats
+import threading
+import time
+
+class Recorder:
+
+    def __init__(self):
+        self.enabled = False
+        self.profiler = None
+        self.stages = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.startTime = time.perf_counter()
+
+recorder = Recorder()
+
+"""
+Starts recording. With hotPaths, cProfile also runs until report() is called.
+"""
+def enable(hotPaths: bool = False):
+    recorder.enabled = True
+    recorder.startTime = time.perf_counter()
+    if hotPaths:
+        recorder.profiler = cProfile.Profile()
+        recorder.profiler.enable()
+
+"""
+Adds amount to the named counter.
+"""
+def increment(name: str, amount: float = 1):
+    if recorder.enabled:
+        with recorder.lock:
+            recorder.counters[name] = recorder.counters.get(name, 0) + amount
+
+"""
+Returns a copy of the counters recorded so far, e.g. for a worker process to hand back what it counted (see runBatch in jira-tracker.py).
+"""
+def counters() -> dict:
+    with recorder.lock:
+        return dict(recorder.counters)
+
+"""
+Records one call of the named stage that took the given number of seconds.
+"""
+def addStageTime(name: str, seconds: float):
+    with recorder.lock:
+        stage = recorder.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        stage['seconds'] += seconds
+        stage['calls'] += 1
+
+"""
+Context manager timing the enclosed block as one call of the named stage.
+"""
+@contextmanager
+def stage(name: str):
+    if not recorder.enabled:
+        yield
+        return
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        addStageTime(name, time.perf_counter() - begin)
+
+"""
+Decorator timing every call of the decorated function as the named stage.
+"""
+def timed(name: str):
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*arguments, **keywords):
+            if not recorder.enabled:
+                return function(*arguments, **keywords)
+            begin = time.perf_counter()
+            try:
+                return function(*arguments, **keywords)
+            finally:
+                addStageTime(name, time.perf_counter() - begin)
+        return wrapper
+    return decorator
+
+"""
+Wraps an iterator so that the time spent waiting for each of its items is recorded as the named stage. Used to measure how long a streaming consumer is blocked on the network.
+"""
+def timedIterator(name: str, iterable):
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+"""
+Hooks a requests session so that every HTTP response is counted in the 'httpRequests' and 'httpBytes' counters. Retries made inside the jira client's session are counted too, as separate requests.
+"""
+def countResponses(session):
+    def hook(response, *arguments, **keywords):
+        increment('httpRequests')
+        increment('httpBytes', len(response.content))
+    session.hooks.setdefault('response', []).append(hook)
+
+"""
+Returns the recorded stages, counters and, if captured, the numHotPaths functions with the greatest cumulative time.
+"""
+def report(numHotPaths: int = 25) -> dict:
+    result = {
+        'totalSeconds': time.perf_counter() - recorder.startTime,
+        'stages': dict(recorder.stages),
+        'counters': dict(recorder.counters),
+    }
+    if recorder.profiler is not None:
+        recorder.profiler.disable()
+        stats = pstats.Stats(recorder.profiler)
+        hotPaths = []
+        for (fileName, line, function), (primitiveCalls, calls, totalTime, cumulativeTime, _) in stats.stats.items():
+            hotPaths.append({'function': '{0}:{1}({2})'.format(fileName, line, function), 'calls': calls, 'ownSeconds': totalTime, 'cumulativeSeconds': cumulativeTime})
+        result['hotPaths'] = sorted(hotPaths, key=lambda entry: entry['cumulativeSeconds'], reverse=True)[:numHotPaths]
+    return result
@@ -0,0 +1,134 @@
+"""
+
+Interval index over every known downtime interval of a site, for arbitrary date range queries.
+
+Built once from an IntervalTable, an IntervalIndex answers without rescanning the intervals:
+    - readiness(start, end): operating and downtime seconds within any [start, end), from a DowntimeCurve (see readiness.py) and the business calendar, two binary searches
+    - downAt(t): the intervals (tickets) open at time t, from a centered interval tree, in O(log n + k) for k matches
+    - maxConcurrent(start, end): the largest number of vehicles down at once within [start, end), overall and per class, from sparse tables over the concurrency timeline, a binary search for each bound and an O(1) range maximum
+
+All times are epoch seconds (see businessCalendar.py). The calendar given to the index bounds the windows whose readiness can be computed, so it should cover every window that will be asked about (e.g. the last year, for rolling 7 and 30 day windows).
+"""
+
+import numpy as np
+
+from tracker.intervalTable import IntervalTable
+from tracker.readiness import buildTimeline, DowntimeCurve
+
+"""
+Builds a sparse table for range maximum queries: level k holds the maximum of every run of 2**k consecutive values.
+"""
+def sparseTable(values) -> list:
+    levels = [np.asarray(values, dtype=np.int64)]
+    width = 1
+    while 2 * width <= len(values):
+        previous = levels[-1]
+        levels.append(np.maximum(previous[:-width], previous[width:]))
+        width *= 2
+    return levels
+
+"""
+Returns the maximum of values[first:last + 1] from a sparse table built by sparseTable. The range must not be empty.
+"""
+def rangeMaximum(levels: list, first: int, last: int) -> int:
+    level = (last - first + 1).bit_length() - 1
+    return int(max(levels[level][first], levels[level][last - (1 << level) + 1]))
+
+class IntervalTree:
+
+    """
+    Builds a centered interval tree over the half-open [starts, ends) intervals. Each node holds the intervals that contain its center, sorted by start and by end; intervals entirely before or after the center go to the left or right subtree. Empty intervals are never open, so they are left out.
+    """
+    def __init__(self, starts, ends):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.centers, self.left, self.right = [], [], []
+        self.byStart, self.startKeys, self.byEnd, self.endKeys = [], [], [], []
+        self.root = self.build(np.flatnonzero(self.ends > self.starts))
+
+    """
+    Adds the subtree holding the given interval rows and returns its node number, or -1 if there are none.
+    """
+    def build(self, rows) -> int:
+        if len(rows) == 0:
+            return -1
+        starts, ends = self.starts[rows], self.ends[rows]
+
+        # the median start is the start of some interval, which then contains the center, so every node holds at least one interval
+        center = int(np.partition(starts, len(starts) // 2)[len(starts) // 2])
+        containing = (starts <= center) & (ends > center)
+        node = len(self.centers)
+        self.centers.append(center)
+        byStart = rows[containing][np.argsort(starts[containing], kind='stable')]
+        byEnd = rows[containing][np.argsort(ends[containing], kind='stable')]
+        self.byStart.append(byStart)
+        self.startKeys.append(self.starts[byStart])
+        self.byEnd.append(byEnd)
+        self.endKeys.append(self.ends[byEnd])
+        self.left.append(-1)
+        self.right.append(-1)
+
+        self.left[node] = self.build(rows[ends <= center])
+        self.right[node] = self.build(rows[starts > center])
+        return node
+
+    """
+    Returns the rows of the intervals that contain t (start <= t < end), in no particular order.
+    """
+    def stab(self, t: int):
+        matches = []
+        node = self.root
+        while node != -1:
+            if t < self.centers[node]:
+                # every interval here ends after the center, so it contains t if it starts at or before t
+                matches.append(self.byStart[node][:np.searchsorted(self.startKeys[node], t, side='right')])
+                node = self.left[node]
+            else:
+                # every interval here starts at or before the center, so it contains t if it ends after t
+                matches.append(self.byEnd[node][np.searchsorted(self.endKeys[node], t, side='right'):])
+                node = self.right[node]
+        return np.concatenate(matches) if matches else np.zeros(0, dtype=np.int64)
+
+class IntervalIndex:
+
+    """
+    INPUT:
+        - intervals: an IntervalTable with every known downtime interval of the site
+        - vehicleClassNames: the class ('Lexus', 'WAMs', ...) of each vehicle of the table, in the order of intervals.vehicles
+        - classes: every class the readiness predicate may ask about
+        - isAutoReady: the site's auto readiness predicate (see config.getAutoReadiness)
+        - calendar: the site's business calendar over the range that queries may cover
+    """
+    def __init__(self, intervals: IntervalTable, vehicleClassNames: list, classes: list, isAutoReady, calendar):
+        self.intervals = intervals
+        self.calendar = calendar
+        timeline = buildTimeline(intervals.starts, intervals.ends, intervals.vehicleCodes, vehicleClassNames, classes)
+        self.curve = DowntimeCurve(timeline, isAutoReady, calendar)
+        self.tree = IntervalTree(intervals.starts, intervals.ends)
+
+        self.segmentStarts, self.segmentEnds = timeline.starts, timeline.ends
+        self.concurrency = {vehicleClass: sparseTable(down) for vehicleClass, down in timeline.down.items()}
+        self.concurrency['total'] = sparseTable(sum(timeline.down.values()) if len(timeline.down) > 0 else np.zeros(len(timeline.starts), dtype=np.int64))
+
+    """
+    Returns (operating seconds, downtime seconds) within [start, end). Only the part of the window covered by the calendar is counted.
+    """
+    def readiness(self, start: int, end: int) -> tuple:
+        operating = int(self.calendar.secondsBefore(end) - self.calendar.secondsBefore(start))
+        return max(operating, 0), int(self.curve.between(start, end))
+
+    """
+    Returns the intervals open at time t, as an IntervalTable sorted by start.
+    """
+    def downAt(self, t: int) -> IntervalTable:
+        return self.intervals.select(np.sort(self.tree.stab(t))).sortedByStart()
+
+    """
+    Returns a dict mapping 'total' and each vehicle class to the largest number of vehicles of that class down at the same time within [start, end).
+    """
+    def maxConcurrent(self, start: int, end: int) -> dict:
+        first = int(np.searchsorted(self.segmentEnds, start, side='right'))
+        last = int(np.searchsorted(self.segmentStarts, end, side='left')) - 1
+        if first > last:
+            return {vehicleClass: 0 for vehicleClass in self.concurrency}
+        return {vehicleClass: rangeMaximum(levels, first, last) for vehicleClass, levels in self.concurrency.items()}
@@ -0,0 +1,148 @@
+"""
+
+Columnar store for downtime intervals.
+
+An IntervalTable holds one row per interval in parallel arrays: int64 epoch-second start and end bounds (see businessCalendar.toEpochSeconds), a small integer vehicle code indexing into the table's list of vehicle names, and the key of the Jira issue the interval came from. Tables are built row by row with an IntervalTableBuilder, which appends to compact typed arrays rather than lists of Python objects, and can be exported to CSV or Parquet in fixed size chunks, so exporting never materializes more than one chunk of rows as Python objects.
+"""
+
+from array import array
+import csv
+import os
+
+import numpy as np
+
+class IntervalTable:
+
+    """
+    INPUT: int64 start and end arrays (epoch seconds), int vehicle code array, list of vehicle names indexed by code, and array of issue keys
+    """
+    def __init__(self, starts, ends, vehicleCodes, vehicles: list, keys):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.vehicleCodes = np.asarray(vehicleCodes, dtype=np.int32)
+        self.vehicles = list(vehicles)
+        self.keys = np.asarray(keys, dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    """
+    Returns a new table holding the rows selected by a boolean mask or an array of row indices.
+    """
+    def select(self, rows) -> 'IntervalTable':
+        return IntervalTable(self.starts[rows], self.ends[rows], self.vehicleCodes[rows], self.vehicles, self.keys[rows])
+
+    """
+    Returns a copy of the table sorted by start bound.
+    """
+    def sortedByStart(self) -> 'IntervalTable':
+        return self.select(np.argsort(self.starts, kind='stable'))
+
+    """
+    Returns the vehicle name of every row.
+    """
+    def vehicleNames(self):
+        return np.asarray(self.vehicles, dtype=object)[self.vehicleCodes] if len(self.vehicles) > 0 else np.zeros(0, dtype=object)
+
+    """
+    Yields the rows from 'first' up to (not including) 'last' as lists of [key, vehicle, start, end], with the bounds formatted as 'YYYY-MM-DD HH:MM:SS' strings.
+    """
+    def formattedRows(self, first: int = 0, last: int = None):
+        last = len(self) if last is None else last
+        starts = self.starts[first:last].astype('datetime64[s]').astype(str)
+        ends = self.ends[first:last].astype('datetime64[s]').astype(str)
+        vehicles = self.vehicleNames()[first:last]
+        for key, vehicle, start, end in zip(self.keys[first:last], vehicles, starts, ends):
+            yield [key, vehicle, start.replace('T', ' '), end.replace('T', ' ')]
+
+    """
+    Writes the table to a CSV file with a key, vehicle, start, end header, chunkSize rows at a time.
+    """
+    def toCsv(self, path: str, chunkSize: int = 65536):
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['key', 'vehicle', 'start', 'end'])
+            for first in range(0, len(self), chunkSize):
+                writer.writerows(self.formattedRows(first, first + chunkSize))
+
+    """
+    Writes the table to a Parquet file, one row group of chunkSize rows at a time. The bounds are stored as second resolution timestamps and the vehicle as a dictionary encoded (categorical) column. Requires pyarrow, which is only needed for this export.
+    """
+    def toParquet(self, path: str, chunkSize: int = 65536):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+
+        vehicles = pa.array(self.vehicles, type=pa.string())
+        schema = pa.schema([('key', pa.string()), ('vehicle', pa.dictionary(pa.int32(), pa.string())), ('start', pa.timestamp('s')), ('end', pa.timestamp('s'))])
+        with pq.ParquetWriter(path, schema) as writer:
+            for first in range(0, max(len(self), 1), chunkSize):
+                last = first + chunkSize
+                writer.write_table(pa.table([
+                    pa.array(self.keys[first:last].tolist(), type=pa.string()),
+                    pa.DictionaryArray.from_arrays(pa.array(self.vehicleCodes[first:last], type=pa.int32()), vehicles),
+                    pa.array(self.starts[first:last], type=pa.timestamp('s')),
+                    pa.array(self.ends[first:last], type=pa.timestamp('s')),
+                ], schema=schema))
+
+    """
+    Exports the table to path, as Parquet if the file name ends in .parquet and as CSV otherwise.
+    """
+    def export(self, path: str):
+        if os.path.splitext(path)[1].lower() == '.parquet':
+            self.toParquet(path)
+        else:
+            self.toCsv(path)
+
+"""
+Concatenates interval tables into one, merging their vehicle name lists.
+"""
+def concatIntervalTables(tables: list) -> IntervalTable:
+    vehicleIndex = {}
+    vehicleCodes = []
+    for table in tables:
+        remap = np.array([vehicleIndex.setdefault(vehicle, len(vehicleIndex)) for vehicle in table.vehicles], dtype=np.int32)
+        vehicleCodes.append(remap[table.vehicleCodes] if len(table) > 0 else np.zeros(0, dtype=np.int32))
+    if len(tables) == 0:
+        return IntervalTable([], [], [], [], [])
+    return IntervalTable(np.concatenate([table.starts for table in tables]), np.concatenate([table.ends for table in tables]),
+                         np.concatenate(vehicleCodes), list(vehicleIndex), np.concatenate([table.keys for table in tables]))
+
+"""
+Splits a table into one table per issue key. Returns a dict mapping each key to its rows.
+"""
+def splitByKey(table: IntervalTable) -> dict:
+    keys, rows = np.unique(table.keys.astype(str), return_inverse=True)
+    order = np.argsort(rows, kind='stable')
+    bounds = np.searchsorted(rows[order], np.arange(len(keys) + 1))
+    return {str(key): table.select(order[bounds[i]:bounds[i + 1]]) for i, key in enumerate(keys)}
+
+"""
+Collects downtime intervals one at a time into compact typed arrays, then freezes them into an IntervalTable.
+"""
+class IntervalTableBuilder:
+
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.vehicleCodes = array('i')
+        self.vehicleIndex = {}
+        self.keys = []
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    """
+    Adds one interval whose start and end are already epoch seconds.
+    """
+    def appendSeconds(self, start: int, end: int, vehicle: str, key: str):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.vehicleCodes.append(self.vehicleIndex.setdefault(vehicle, len(self.vehicleIndex)))
+        self.keys.append(key)
+
+    def build(self) -> IntervalTable:
+        return IntervalTable(np.array(self.starts, dtype=np.int64), np.array(self.ends, dtype=np.int64), np.array(self.vehicleCodes, dtype=np.int32),
+                             list(self.vehicleIndex), self.keys)
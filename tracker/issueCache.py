@@ -0,0 +1,146 @@
+"""
+
+Local SQLite cache of the Jira issues used by jira-tracker.py, keyed by issue key.
+
+Only what generateDowntimeIntervals reads is kept: the issue creation/update dates, vehicle, current vehicle state impact, and for every history entry its timestamp and its 'Vehicle State Impact' items (or, for entries that don't change it, the field of the first item). Each sync records a high-water mark for its site and the start of its date range, so a later run for any range starting no earlier only needs to ask Jira for issues updated since then, and a run for an already-synced range can be answered without contacting Jira at all.
+
+The cache is disposable: if the schema version changes, the tables are dropped and rebuilt on the next sync.
+"""
+
+import sqlite3
+
+from pandas import to_datetime
+
+from tracker.issueRecords import VEHICLE_STATE_IMPACT
+
+SCHEMA_VERSION = 3
+
+class IssueCache:
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.connection.executescript("""
+                DROP TABLE IF EXISTS issues;
+                DROP TABLE IF EXISTS histories;
+                DROP TABLE IF EXISTS syncs;
+                PRAGMA user_version = {0};
+            """.format(SCHEMA_VERSION))
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS issues (
+                key TEXT PRIMARY KEY,
+                id TEXT NOT NULL,
+                site TEXT NOT NULL,
+                created TEXT NOT NULL,
+                updated TEXT NOT NULL,
+                updatedLocal TEXT NOT NULL,
+                vehicle TEXT,
+                vehicleImpact TEXT
+            );
+            CREATE INDEX IF NOT EXISTS issuesBySite ON issues (site, updatedLocal);
+            CREATE TABLE IF NOT EXISTS histories (
+                key TEXT NOT NULL,
+                historyId INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                created TEXT NOT NULL,
+                field TEXT,
+                toString TEXT,
+                PRIMARY KEY (key, historyId, position)
+            );
+            CREATE TABLE IF NOT EXISTS syncs (
+                site TEXT NOT NULL,
+                rangeStart TEXT NOT NULL,
+                lastSync TEXT NOT NULL,
+                PRIMARY KEY (site, rangeStart)
+            );
+        """)
+
+    """
+    Returns the high-water mark (UTC, ISO format string) of the last sync of the site that covers the issues updated since rangeStart, or None if there is none. A sync fetches every issue updated since the start of its range, however far past the end of the range (see buildJQL in jira-tracker.py), so a sync of any range that starts no later covers it, whatever the range ends: e.g. a rolling 7 day range inside a synced quarter, or a rolling range ending now that was synced on an earlier run, only needs the issues updated since.
+    """
+    def lastSync(self, site: str, rangeStart: str) -> str:
+        row = self.connection.execute('SELECT MAX(lastSync) FROM syncs WHERE site = ? AND rangeStart <= ?', (site, rangeStart)).fetchone()
+        return row[0]
+
+    """
+    Records that every issue of the site updated since rangeStart and before syncTime (UTC, ISO format string) is now in the cache.
+    """
+    def markSynced(self, site: str, rangeStart: str, syncTime: str):
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO syncs VALUES (?, ?, ?)', (site, rangeStart, syncTime))
+
+    """
+    Merges freshly fetched issues into the cache, replacing any previous copy of each issue and its history. An issue may be listed more than once (offset paging returns a ticket twice when another is created mid-sync); the last copy wins.
+
+    INPUT: the site name, and a list of issues in the compact form returned by compactIssue
+    """
+    def storeIssues(self, site: str, issues: list):
+        issueRows, historyRows, keys = [], [], []
+        for issue in {issue['key']: issue for issue in issues}.values():
+            fields = issue['fields']
+            vehicles = fields['customfield_10068']
+            vehicleImpact = fields['customfield_10064']
+            updatedLocal = to_datetime(fields['updated']).tz_localize(None).strftime('%Y-%m-%d %H:%M:%S')
+            keys.append((issue['key'],))
+            issueRows.append((issue['key'], issue['id'], site, fields['created'], fields['updated'], updatedLocal,
+                              vehicles[0] if vehicles else None, vehicleImpact['value'] if vehicleImpact else None))
+
+            for change in issue['changelog']['histories']:
+                items = change['items'] or [{'field': None, 'toString': None}]
+                for position, item in enumerate(items):
+                    historyRows.append((issue['key'], int(change['id']), position, change['created'], item['field'], item['toString']))
+
+        with self.connection:
+            self.connection.executemany('DELETE FROM histories WHERE key = ?', keys)
+            self.connection.executemany('INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?)', issueRows)
+            self.connection.executemany('INSERT INTO histories VALUES (?, ?, ?, ?, ?, ?)', historyRows)
+
+    """
+    Returns the cached issues of the site whose last update falls in [rangeStart, rangeEnd] (dates as 'YYYY-MM-DD' strings, compared in local time as the JQL in buildJQL does), in the compact form returned by compactIssue.
+    """
+    def loadIssues(self, site: str, rangeStart: str, rangeEnd: str) -> list:
+        issueRows = self.connection.execute('SELECT key, id, created, updated, vehicle, vehicleImpact FROM issues WHERE site = ? AND updatedLocal >= ? AND updatedLocal <= ? ORDER BY created DESC', (site, rangeStart, rangeEnd)).fetchall()
+
+        histories = {row[0]: [] for row in issueRows}
+        for key, historyId, created, field, toString in self.connection.execute('SELECT histories.key, historyId, histories.created, field, toString FROM histories JOIN issues ON issues.key = histories.key WHERE site = ? AND updatedLocal >= ? AND updatedLocal <= ? ORDER BY histories.key, historyId, position', (site, rangeStart, rangeEnd)):
+            issueHistories = histories[key]
+            if len(issueHistories) == 0 or issueHistories[-1]['id'] != str(historyId):
+                issueHistories.append({'id': str(historyId), 'created': created, 'items': []})
+            if field is not None:
+                issueHistories[-1]['items'].append({'field': field, 'toString': toString})
+
+        issues = []
+        for key, issueId, created, updated, vehicle, vehicleImpact in issueRows:
+            issues.append(packIssue(key, issueId, created, updated, None if vehicle is None else [vehicle], None if vehicleImpact is None else {'value': vehicleImpact}, histories[key]))
+        return issues
+
+"""
+Builds an issue in compact form: a plain dict shaped like the raw Jira JSON of an issue fetched with its complete changelog embedded, holding only what generateDowntimeIntervals reads. Compact issues are small and picklable, so they can be cached or sent to worker processes.
+"""
+def packIssue(key: str, issueId: str, created: str, updated: str, vehicles: list, vehicleImpact: dict, histories: list) -> dict:
+    return {
+        'key': key,
+        'id': issueId,
+        'fields': {'created': created, 'updated': updated, 'customfield_10068': vehicles, 'customfield_10064': vehicleImpact},
+        'changelog': {'startAt': 0, 'maxResults': len(histories), 'total': len(histories), 'histories': histories},
+    }
+
+"""
+Returns the items of a history entry worth keeping: every 'Vehicle State Impact' item, or if there are none, the field of the first item only. Items are raw JSON dicts.
+"""
+def compactItems(items: list) -> list:
+    kept = [{'field': item.get('field'), 'toString': item.get('toString')} for item in items if item.get('field') == VEHICLE_STATE_IMPACT]
+    if len(kept) == 0 and len(items) > 0:
+        kept = [{'field': items[0].get('field'), 'toString': None}]
+    return kept
+
+"""
+Returns the compact form (see packIssue) of a raw Jira issue dict (as returned by a search with json_result=True) and its complete, ascending changelog histories (raw dicts).
+"""
+def compactIssue(issue: dict, histories: list) -> dict:
+    fields = issue['fields']
+    vehicles = fields.get('customfield_10068')
+    vehicleImpact = fields.get('customfield_10064')
+    compactHistories = [{'id': str(change['id']), 'created': change['created'], 'items': compactItems(change['items'])} for change in histories]
+    return packIssue(issue['key'], issue['id'], fields['created'], fields['updated'], None if vehicles is None else list(vehicles),
+                     None if vehicleImpact is None else {'value': vehicleImpact['value']}, compactHistories)
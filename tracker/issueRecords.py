@@ -0,0 +1,54 @@
+"""
+
+Lightweight parsing of Jira issues into the few facts jira-tracker.py needs, without building jira Resource objects.
+
+An IssueRecord holds the issue key, vehicle, creation time, current vehicle state impact, the times of its first and last history entries, and every 'Vehicle State Impact' transition of its history, whatever the position of that change among the items of its history entry. All times are epoch seconds of the wall clock time Jira reports, with the UTC offset dropped. Records are built one issue at a time from the raw JSON of a search page (or from a compact issue, see tracker/issueCache.py, which has the same shape), so the raw page can be released as soon as it has been parsed.
+"""
+
+from collections import namedtuple
+from calendar import timegm
+
+from pandas import to_datetime
+
+from tracker.businessCalendar import toEpochSeconds
+
+VEHICLE_STATE_IMPACT = 'Vehicle State Impact'
+
+IssueRecord = namedtuple('IssueRecord', ['key', 'vehicle', 'created', 'vehicleImpact', 'firstChange', 'lastChange', 'transitions'])
+
+"""
+Converts a Jira timestamp ('2022-01-14T13:25:07.139-0500') to epoch seconds of its wall clock time, dropping the UTC offset and the milliseconds. The fixed layout is sliced directly; anything else (e.g. a 'YYYY-MM-DD' date) goes through pandas.
+"""
+def parseJiraTime(text: str) -> int:
+    if len(text) >= 19 and text[10] == 'T':
+        return timegm((int(text[0:4]), int(text[5:7]), int(text[8:10]), int(text[11:13]), int(text[14:16]), int(text[17:19])))
+    return toEpochSeconds(to_datetime(text).tz_localize(None))
+
+"""
+Returns the 'Vehicle State Impact' transitions of a raw changelog as a list of (epoch seconds, new value) tuples, in the order of the histories given. Every item of every history entry is inspected.
+"""
+def stateTransitions(histories: list) -> list:
+    transitions = []
+    for history in histories:
+        for item in history['items']:
+            if item['field'] == VEHICLE_STATE_IMPACT:
+                transitions.append((parseJiraTime(history['created']), item['toString']))
+    return transitions
+
+"""
+Builds the record of an issue from its raw JSON.
+
+INPUT: a raw Jira issue dict (or a compact issue), and its complete changelog histories as raw dicts in ascending order
+OUTPUT: an IssueRecord
+"""
+def issueRecord(issue: dict, histories: list) -> IssueRecord:
+    fields = issue['fields']
+    vehicles = fields.get('customfield_10068')
+    vehicleImpact = fields.get('customfield_10064')
+    return IssueRecord(issue['key'],
+                       vehicles[0].capitalize() if vehicles else None,
+                       parseJiraTime(fields['created']),
+                       vehicleImpact['value'] if vehicleImpact else None,
+                       parseJiraTime(histories[0]['created']) if histories else None,
+                       parseJiraTime(histories[-1]['created']) if histories else None,
+                       stateTransitions(histories))
@@ -0,0 +1,119 @@
+"""
+
+Concurrent, rate-limit-aware requests to the Jira API.
+
+Requests run on a thread pool, gated by an AdaptiveLimiter that bounds how many are in flight at once. When Jira answers 429 Too Many Requests, the limiter halves the allowed concurrency and pauses every thread for the Retry-After delay, and the request is retried. Transient failures (502, 503 and 504 responses, dropped connections and timeouts) are retried too, after a backoff, without lowering the concurrency. Each successful request then grows the concurrency back by one over a full window of requests (additive increase, multiplicative decrease), up to the configured maximum.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+
+from jira.exceptions import JIRAError
+from requests.exceptions import ConnectionError, Timeout
+
+import tracker.instrumentation as instrumentation
+
+TOO_MANY_REQUESTS = 429
+TRANSIENT_STATUSES = (502, 503, 504)
+
+class AdaptiveLimiter:
+
+    def __init__(self, maxConcurrency: int):
+        self.maxConcurrency = max(1, maxConcurrency)
+        self.limit = self.maxConcurrency
+        self.active = 0
+        self.credit = 0.0
+        self.resumeAt = 0.0
+        self.throttleCount = 0
+        self.condition = threading.Condition()
+
+    """
+    Blocks until a request may be sent: no Retry-After pause is in effect and fewer than 'limit' requests are in flight.
+    """
+    def acquire(self):
+        with self.condition:
+            while True:
+                pause = self.resumeAt - time.monotonic()
+                if pause > 0:
+                    self.condition.wait(pause)
+                elif self.active < self.limit:
+                    self.active += 1
+                    return
+                else:
+                    self.condition.wait()
+
+    """
+    Marks a request as finished. retryAfter is None unless the request was throttled, in which case it is the delay in seconds requested by the server. A request that failed for any other reason gives its slot back with succeeded=False, which doesn't count towards growing the concurrency.
+    """
+    def release(self, retryAfter: float = None, succeeded: bool = True):
+        with self.condition:
+            self.active -= 1
+            if retryAfter is not None:
+                self.throttleCount += 1
+                self.limit = max(1, self.limit // 2)
+                self.credit = 0.0
+                self.resumeAt = max(self.resumeAt, time.monotonic() + retryAfter)
+            elif succeeded and self.limit < self.maxConcurrency:
+                self.credit += 1.0 / self.limit
+                if self.credit >= 1.0:
+                    self.limit += 1
+                    self.credit = 0.0
+            self.condition.notify_all()
+
+"""
+Returns how long to wait before retrying a throttled or failed request: the server's Retry-After header when it gives a number of seconds, otherwise an exponential backoff based on the attempt number.
+"""
+def retryDelay(error: Exception, attempt: int) -> float:
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return max(0.0, float(headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return min(60.0, 2.0 ** attempt)
+
+"""
+Returns whether a failed request is worth retrying: Jira answered 429 Too Many Requests or a transient server error, or the connection dropped or timed out.
+"""
+def isRetryable(error: Exception) -> bool:
+    if isinstance(error, JIRAError):
+        return error.status_code == TOO_MANY_REQUESTS or error.status_code in TRANSIENT_STATUSES
+    return isinstance(error, (ConnectionError, Timeout))
+
+"""
+Calls request(argument) once the limiter allows it, retrying up to maxRetries times when Jira answers 429 (see AdaptiveLimiter) or the request fails transiently (see isRetryable). Any other error is raised immediately. The limiter slot is given back however the request ends.
+"""
+def callWithBackoff(request, argument, limiter: AdaptiveLimiter, maxRetries: int = 5):
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            result = request(argument)
+        except Exception as error:
+            if not isRetryable(error) or attempt == maxRetries:
+                limiter.release(succeeded=False)
+                raise
+            delay = retryDelay(error, attempt)
+            instrumentation.increment('backoffSeconds', delay)
+            if isinstance(error, JIRAError) and error.status_code == TOO_MANY_REQUESTS:
+                instrumentation.increment('throttledRetries')
+                limiter.release(retryAfter=delay)
+            else:
+                instrumentation.increment('transientRetries')
+                limiter.release(succeeded=False)
+                time.sleep(delay)
+            attempt += 1
+            continue
+        except BaseException:
+            limiter.release(succeeded=False)
+            raise
+        limiter.release()
+        return result
+
+"""
+Calls request(argument) for every argument on a thread pool bounded by the limiter, and yields the results in the order the requests complete, so callers can start processing before the slowest request returns.
+"""
+def fetchConcurrently(request, arguments, limiter: AdaptiveLimiter):
+    with ThreadPoolExecutor(max_workers=limiter.maxConcurrency) as executor:
+        futures = [executor.submit(callWithBackoff, request, argument, limiter) for argument in arguments]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,184 @@
+"""
+
+Sweep-line auto readiness engine.
+
+Downtime intervals are turned into a concurrency timeline: the sorted, consecutive time segments over which the set of down vehicles does not change, along with the number of down vehicles of each class (e.g. 'Lexus', 'WAMs') over each segment. A site's auto readiness definition is a predicate over those per-class counts, so the downtime is the operating time (see businessCalendar.py) of every segment for which the predicate fails. 
+
+Overlapping intervals of the same vehicle (e.g. two open tickets for one car) are merged first, so a vehicle is only ever counted once and no time is double counted. Building the timeline is a sort of the interval end points followed by cumulative sums, so it runs in O(n log n) for n intervals.
+
+The failing segments also give a cumulative downtime curve (DowntimeCurve), from which the downtime of any time bucket, interval, ticket or vehicle is read off with binary searches, without sweeping the intervals again.
+"""
+
+from collections import namedtuple
+import heapq
+
+import numpy as np
+
+"""
+starts, ends: int64 epoch-seconds arrays with the bounds of each segment. down: dict mapping each vehicle class to an int array with the number of down vehicles of that class during each segment.
+"""
+Timeline = namedtuple('Timeline', ['starts', 'ends', 'down'])
+
+"""
+Merges overlapping or touching intervals of the same vehicle, so that each vehicle's intervals are disjoint. Returns the merged (starts, ends, vehicleCodes) arrays.
+
+All vehicles are merged in one pass by shifting each vehicle's intervals onto its own stretch of the time axis: no interval can then overlap an interval of another vehicle, and the running maximum of the end bounds only needs to be computed once.
+"""
+def mergeVehicleIntervals(starts, ends, vehicleCodes):
+    keep = ends > starts
+    starts, ends, vehicleCodes = starts[keep], ends[keep], vehicleCodes[keep]
+    if len(starts) == 0:
+        return starts, ends, vehicleCodes
+
+    shift = vehicleCodes.astype(np.int64) * (int(ends.max() - min(starts.min(), 0)) + 1)
+    shiftedStarts, shiftedEnds = starts + shift, ends + shift
+    order = np.argsort(shiftedStarts, kind='stable')
+    shiftedStarts, shiftedEnds, vehicleCodes, shift = shiftedStarts[order], shiftedEnds[order], vehicleCodes[order], shift[order]
+
+    # an interval opens a new merged block when it starts after every earlier interval has ended
+    reach = np.maximum.accumulate(shiftedEnds)
+    blockStarts = np.concatenate(([True], shiftedStarts[1:] > reach[:-1]))
+    firsts = np.flatnonzero(blockStarts)
+    lasts = np.concatenate((firsts[1:], [len(shiftedStarts)])) - 1
+    return shiftedStarts[firsts] - shift[firsts], reach[lasts] - shift[firsts], vehicleCodes[firsts]
+
+"""
+Builds the concurrency timeline for a set of downtime intervals.
+
+INPUT:
+    - starts, ends: int64 epoch-seconds arrays, the bounds of each downtime interval
+    - vehicleCodes: int array, the vehicle of each interval as an index into vehicleClassNames
+    - vehicleClassNames: the class ('Lexus', 'WAMs', ...) of each vehicle code
+    - classes: every class the readiness predicate may ask about. Classes with no intervals get all-zero counts
+OUTPUT: a Timeline covering [earliest start, latest end]
+"""
+def buildTimeline(starts, ends, vehicleCodes, vehicleClassNames: list, classes: list) -> Timeline:
+    classes = list(dict.fromkeys(list(classes) + list(vehicleClassNames)))
+    starts, ends, vehicleCodes = mergeVehicleIntervals(np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64), np.asarray(vehicleCodes, dtype=np.int64))
+    if len(starts) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return Timeline(empty, empty, {vehicleClass: empty for vehicleClass in classes})
+
+    # every merged interval is one +1 event at its start and one -1 event at its end, for its vehicle's class
+    classIndex = {vehicleClass: i for i, vehicleClass in enumerate(classes)}
+    vehicleClassCodes = np.array([classIndex[vehicleClass] for vehicleClass in vehicleClassNames], dtype=np.int64)
+    eventTimes = np.concatenate((starts, ends))
+    eventClasses = np.tile(vehicleClassCodes[vehicleCodes], 2)
+    eventDeltas = np.concatenate((np.ones(len(starts), dtype=np.int64), -np.ones(len(ends), dtype=np.int64)))
+    order = np.argsort(eventTimes, kind='stable')
+    eventTimes, eventClasses, eventDeltas = eventTimes[order], eventClasses[order], eventDeltas[order]
+
+    # running count of down vehicles per class after each event
+    deltas = np.zeros((len(eventTimes), len(classes)), dtype=np.int64)
+    deltas[np.arange(len(eventTimes)), eventClasses] = eventDeltas
+    counts = np.cumsum(deltas, axis=0)
+
+    # the state of a segment is the state after the last event at its start time
+    boundaries = np.flatnonzero(np.concatenate((eventTimes[1:] != eventTimes[:-1], [True])))
+    times = eventTimes[boundaries]
+    counts = counts[boundaries[:-1]]
+    return Timeline(times[:-1], times[1:], {vehicleClass: counts[:, classIndex[vehicleClass]] for vehicleClass in classes})
+
+"""
+Evaluates an auto readiness predicate over every segment of the timeline. The predicate receives the timeline's per-class count arrays and must return a boolean (array) that is True while the site is auto ready, so it should combine conditions with &, | and ~. Returns a boolean array, True for segments where the site is NOT auto ready.
+"""
+def notReadySegments(timeline: Timeline, isAutoReady):
+    ready = np.broadcast_to(np.asarray(isAutoReady(timeline.down), dtype=bool), timeline.starts.shape)
+    return ~ready
+
+"""
+Returns the total operating time, in seconds, during which the timeline fails the given auto readiness predicate, using the business calendar to only count site operating hours.
+"""
+def accruedDowntime(timeline: Timeline, isAutoReady, calendar) -> int:
+    notReady = notReadySegments(timeline, isAutoReady)
+    return int(calendar.operatingSeconds(timeline.starts[notReady], timeline.ends[notReady]).sum())
+
+"""
+Cumulative downtime as a function of time: before(t) is the operating time, in seconds, during which the site was NOT auto ready before t. Built once from the failing segments of a timeline, it answers any number of queries with a binary search each, so the downtime within any window, interval or time bucket is a subtraction of two lookups.
+
+With weights (one per segment of the timeline), each failing segment only counts for that fraction of its operating time, e.g. the share of a segment's downtime charged to one vehicle (see downtimeShares).
+"""
+class DowntimeCurve:
+
+    def __init__(self, timeline: Timeline, isAutoReady, calendar, weights=None):
+        notReady = notReadySegments(timeline, isAutoReady)
+        self.calendar = calendar
+        self.starts = timeline.starts[notReady]
+        self.ends = timeline.ends[notReady]
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float64)[notReady]
+        operating = calendar.operatingSeconds(self.starts, self.ends)
+        if self.weights is not None:
+            operating = operating * self.weights
+        self.cumulative = np.zeros(len(self.starts) + 1, dtype=operating.dtype)
+        np.cumsum(operating, out=self.cumulative[1:])
+        self.total = int(round(self.cumulative[-1]))
+
+    """
+    Returns the downtime before t, for an epoch-seconds scalar or array.
+    """
+    def before(self, t):
+        t = np.asarray(t, dtype=np.int64)
+        if len(self.starts) == 0:
+            return np.zeros(t.shape, dtype=self.cumulative.dtype)
+        segment = np.searchsorted(self.starts, t, side='right') - 1
+        clipped = np.maximum(segment, 0)
+        partial = self.calendar.operatingSeconds(self.starts[clipped], np.minimum(t, self.ends[clipped]))
+        if self.weights is not None:
+            partial = partial * self.weights[clipped]
+        return np.where(segment >= 0, self.cumulative[clipped] + partial, 0)
+
+    """
+    Returns the downtime within [start, end), for epoch-seconds scalars or arrays.
+    """
+    def between(self, start, end):
+        return np.maximum(self.before(end) - self.before(start), 0)
+
+"""
+Splits the calendar's range into consecutive buckets of bucketSeconds (e.g. 86400 for days, 3600 for hours) and returns (bucket starts, operating seconds, downtime seconds) arrays, one entry per bucket.
+"""
+def downtimeSeries(curve: DowntimeCurve, bucketSeconds: int) -> tuple:
+    edges = curve.calendar.bucketEdges(bucketSeconds)
+    operating = np.diff(curve.calendar.secondsBefore(edges))
+    downtime = np.diff(curve.before(edges))
+    return edges[:-1], operating, downtime
+
+"""
+Returns, for each vehicle class, the cumulative curve (see DowntimeCurve) of the downtime charged to each single down vehicle of that class. Every second the site is not auto ready is split evenly among the down vehicles to blame for it, so the charges of all the vehicles add up to the total downtime:
+    - the classes to blame are those whose vehicles, all brought back up, would make the site auto ready. E.g. with the default definition, the Lexus while three of them are down, or the WAMs while it is down with at most one Lexus
+    - if no single class would do (e.g. the WAMs and two Lexus are down), every down vehicle is to blame
+"""
+def downtimeShares(timeline: Timeline, isAutoReady, calendar) -> dict:
+    shape = timeline.starts.shape
+    toBlame = {}
+    for vehicleClass, down in timeline.down.items():
+        withoutClass = dict(timeline.down)
+        withoutClass[vehicleClass] = np.zeros_like(down)
+        toBlame[vehicleClass] = (down > 0) & np.broadcast_to(np.asarray(isAutoReady(withoutClass), dtype=bool), shape)
+    noSingleClass = ~np.logical_or.reduce(list(toBlame.values())) if toBlame else np.zeros(shape, dtype=bool)
+    for vehicleClass, down in timeline.down.items():
+        toBlame[vehicleClass] |= noSingleClass & (down > 0)
+
+    blamedVehicles = sum(timeline.down[vehicleClass] * toBlame[vehicleClass] for vehicleClass in toBlame) if toBlame else np.zeros(shape, dtype=np.int64)
+    share = 1 / np.maximum(blamedVehicles, 1)
+    return {vehicleClass: DowntimeCurve(timeline, isAutoReady, calendar, np.where(toBlame[vehicleClass], share, 0)) for vehicleClass in toBlame}
+
+"""
+Attributes downtime to groups of intervals, e.g. the intervals of each ticket or of each vehicle. The intervals of a group are merged first, so a group is never charged twice for the same stretch of time, and each merged interval is charged its vehicle's share of the downtime while it was open (see downtimeShares).
+
+INPUT: the curves returned by downtimeShares, the interval bounds, the group code of each interval, and the vehicle class of each group. Every interval of a group must belong to a vehicle of that class
+OUTPUT: the downtime attributed to each group code, in whole seconds, as an int64 array indexed by code
+"""
+def attributedImpact(curves: dict, starts, ends, groupCodes, groupClasses: list):
+    starts, ends, groupCodes = mergeVehicleIntervals(np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64), np.asarray(groupCodes, dtype=np.int64))
+    intervalClasses = np.asarray(groupClasses, dtype=object)[groupCodes] if len(groupCodes) > 0 else np.zeros(0, dtype=object)
+    impact = np.zeros(len(starts), dtype=np.float64)
+    for vehicleClass, curve in curves.items():
+        isClass = intervalClasses == vehicleClass
+        impact[isClass] = curve.between(starts[isClass], ends[isClass])
+    return np.rint(np.bincount(groupCodes, weights=impact, minlength=len(groupClasses))).astype(np.int64)
+
+"""
+Returns the n (name, impact) pairs with the largest impact, largest first, keeping only a bounded heap of n candidates while scanning.
+"""
+def topImpacts(names, impacts, n: int) -> list:
+    return [(name, int(impact)) for impact, name in heapq.nlargest(n, zip(impacts, names), key=lambda pair: pair[0]) if impact > 0]
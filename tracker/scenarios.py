@@ -0,0 +1,62 @@
+"""
+
+What-if evaluation of many auto readiness definitions at once.
+
+A scenario combines a readiness predicate (e.g. no more than k Lexus down), a set of site operating hours, and a set of tickets to leave out. Rather than recomputing the downtime once per scenario, the intervals are laid on one shared timeline: the segments between consecutive interval end points, with the number of down vehicles of each class over every segment computed for every ticket exclusion set at once. Each predicate is then evaluated over the whole (exclusion set, segment) grid, and the downtime of every (predicate, exclusion set, hours) combination comes out of a single matrix product of the not ready segments with the operating seconds of each segment under each set of hours.
+
+Overlapping intervals of the same vehicle only count the vehicle once, as in readiness.py.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from tracker.intervalTable import IntervalTable
+
+"""
+starts, ends: int64 epoch-seconds arrays with the bounds of each segment. down: dict mapping each vehicle class to an int array of shape (number of exclusion sets, number of segments).
+"""
+ScenarioTimeline = namedtuple('ScenarioTimeline', ['starts', 'ends', 'down'])
+
+"""
+Builds the shared timeline of a set of downtime intervals for several ticket exclusion sets.
+
+INPUT:
+    - intervals: an IntervalTable
+    - vehicleClassNames: the class ('Lexus', 'WAMs', ...) of each vehicle of the table, in the order of intervals.vehicles
+    - classes: every class the readiness predicates may ask about
+    - exclusions: a list of sets of issue keys. Row i of every count array leaves out the intervals of the tickets in exclusions[i]
+OUTPUT: a ScenarioTimeline
+"""
+def scenarioTimeline(intervals: IntervalTable, vehicleClassNames: list, classes: list, exclusions: list) -> ScenarioTimeline:
+    classes = list(dict.fromkeys(list(classes) + list(vehicleClassNames)))
+    keep = intervals.ends > intervals.starts
+    starts, ends, vehicleCodes, keys = intervals.starts[keep], intervals.ends[keep], intervals.vehicleCodes[keep], intervals.keys[keep]
+    times = np.unique(np.concatenate((starts, ends)))
+
+    # +1 at the first segment of each interval and -1 after its last, for its vehicle, in every exclusion set that keeps it
+    included = np.array([~np.isin(keys.astype(str), sorted(excluded)) for excluded in exclusions], dtype=np.int64).reshape(len(exclusions), len(keys))
+    coverage = np.zeros((len(exclusions), len(vehicleClassNames), len(times)), dtype=np.int64)
+    scenario = np.arange(len(exclusions))[:, None]
+    np.add.at(coverage, (scenario, vehicleCodes[None, :], np.searchsorted(times, starts)[None, :]), included)
+    np.add.at(coverage, (scenario, vehicleCodes[None, :], np.searchsorted(times, ends)[None, :]), -included)
+    isDown = np.cumsum(coverage, axis=2)[:, :, :-1] > 0
+
+    vehicleClassNames = np.asarray(vehicleClassNames, dtype=object)
+    down = {vehicleClass: isDown[:, vehicleClassNames == vehicleClass, :].sum(axis=1) for vehicleClass in classes}
+    return ScenarioTimeline(times[:-1], times[1:], down)
+
+"""
+Computes the downtime of every scenario of the grid.
+
+INPUT:
+    - timeline: a ScenarioTimeline
+    - predicates: auto readiness predicates (see config.py), each evaluated over the (exclusion set, segment) count arrays of the timeline
+    - calendars: one business calendar per set of operating hours
+OUTPUT: an int64 array of downtime seconds of shape (predicates, exclusion sets, calendars)
+"""
+def scenarioDowntime(timeline: ScenarioTimeline, predicates: list, calendars: list):
+    shape = (len(next(iter(timeline.down.values()))), len(timeline.starts))
+    notReady = np.stack([~np.broadcast_to(np.asarray(isAutoReady(timeline.down), dtype=bool), shape) for isAutoReady in predicates]).astype(np.int64)
+    operating = np.stack([calendar.operatingSeconds(timeline.starts, timeline.ends) for calendar in calendars]).astype(np.int64)
+    return notReady @ operating.T
@@ -0,0 +1,217 @@
+"""
+
+Long-running readiness service.
+
+A ReadinessStore keeps every site's issue histories (in the compact form of issueCache.py) and their downtime intervals in memory, along with an interval index of each site (see intervalIndex.py). Readiness, the tickets down at a given time, and the most vehicles down at once are then answered for any date range inside the loaded window in logarithmic time, with no Jira request.
+
+Jira 'issue updated' webhook payloads (or a local replay of them) update the store incrementally: only the affected issue's history and intervals are rebuilt, and the site's index is rebuilt on the next query.
+
+The store is served over a small local HTTP API. Every range is [start, end), given as a quarter, as start and end dates (or date times, 'YYYY-MM-DDTHH:MM'), or as a rolling number of days ending at end (by default, now):
+    GET  /readiness?site=AA&quarter=3
+    GET  /readiness?site=AA&start=2022-07-01&end=2022-08-01
+    GET  /readiness?site=AA&days=7
+    GET  /down?site=AA&at=2022-07-14T10:30                       (tickets down at that time)
+    GET  /concurrency?site=AA&days=30                            (most vehicles down at once)
+    POST /webhook                                                (Jira webhook JSON payload)
+"""
+
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import json
+import threading
+
+import numpy as np
+
+import config.config as config
+from tracker.businessCalendar import siteCalendar, toEpochSeconds
+from tracker.intervalTable import concatIntervalTables, splitByKey
+from tracker.issueCache import compactItems
+from tracker.intervalIndex import IntervalIndex
+
+class ReadinessStore:
+
+    """
+    INPUT:
+        - issuesBySite: dict mapping each served site to its list of compact issues
+        - window: the ('YYYY-MM-DD', 'YYYY-MM-DD') date range the issues were fetched for. Queries must fall inside it
+        - generateIntervals: function(list of compact issues, window) returning their IntervalTable, i.e. generateDowntimeIntervals
+    """
+    def __init__(self, issuesBySite: dict, window: tuple, generateIntervals):
+        self.window = window
+        self.windowBounds = (int(toEpochSeconds(window[0])), int(toEpochSeconds(window[1])))
+        self.generateIntervals = generateIntervals
+        self.lock = threading.Lock()
+        self.issues = {}
+        self.intervals = {}
+        self.indexes = {}
+        for site, issues in issuesBySite.items():
+            self.issues[site] = {issue['key']: issue for issue in issues}
+            self.intervals[site] = splitByKey(generateIntervals(issues, window)) if len(issues) > 0 else {}
+
+    """
+    Returns the site's interval index (see intervalIndex.py) over the loaded window, rebuilding it from the site's intervals if an update invalidated it.
+    """
+    def index(self, site: str) -> IntervalIndex:
+        assert site in self.issues, "Site {0} is not served, choose one of {1}".format(site, sorted(self.issues))
+        if site not in self.indexes:
+            intervals = concatIntervalTables(list(self.intervals[site].values()))
+            self.indexes[site] = IntervalIndex(intervals, [config.getVehicleClass(site, vehicle) for vehicle in intervals.vehicles], config.vehicleClasses,
+                                               config.getAutoReadiness(site), siteCalendar(site, *self.window))
+        return self.indexes[site]
+
+    """
+    Checks that [start, end) (date or date time strings) is a non-empty range inside the loaded window, and returns its bounds as epoch seconds.
+    """
+    def bounds(self, start: str, end: str) -> tuple:
+        startSeconds, endSeconds = int(toEpochSeconds(start)), int(toEpochSeconds(end))
+        assert self.windowBounds[0] <= startSeconds < endSeconds <= self.windowBounds[1], "Date range [{0}, {1}) is not inside the loaded window [{2}, {3})".format(start, end, *self.window)
+        return startSeconds, endSeconds
+
+    """
+    Computes the auto readiness of a site over [start, end) ('YYYY-MM-DD' or 'YYYY-MM-DDTHH:MM' strings). Returns a JSON-serializable dict.
+    """
+    def readiness(self, site: str, start: str, end: str) -> dict:
+        with self.lock:
+            operating, downtime = self.index(site).readiness(*self.bounds(start, end))
+        return {
+            'site': site, 'start': start, 'end': end,
+            'operatingSeconds': operating, 'downtimeSeconds': downtime,
+            'autoReadinessPercent': None if operating == 0 else (operating - downtime) / operating * 100,
+        }
+
+    """
+    Lists the tickets whose downtime interval is open at the given time ('YYYY-MM-DD' or 'YYYY-MM-DDTHH:MM'). Returns a JSON-serializable dict.
+    """
+    def down(self, site: str, at: str) -> dict:
+        atSeconds = int(toEpochSeconds(at))
+        assert self.windowBounds[0] <= atSeconds < self.windowBounds[1], "{0} is not inside the loaded window [{1}, {2})".format(at, *self.window)
+        with self.lock:
+            intervals = self.index(site).downAt(atSeconds)
+        return {'site': site, 'at': at, 'tickets': [dict(zip(['key', 'vehicle', 'start', 'end'], row)) for row in intervals.formattedRows()]}
+
+    """
+    Returns the largest number of vehicles down at the same time over [start, end), in total and per vehicle class, as a JSON-serializable dict.
+    """
+    def concurrency(self, site: str, start: str, end: str) -> dict:
+        with self.lock:
+            maxDown = self.index(site).maxConcurrent(*self.bounds(start, end))
+        return {'site': site, 'start': start, 'end': end, 'maxDown': maxDown}
+
+    """
+    Applies a Jira webhook payload ('jira:issue_created', 'jira:issue_updated' or 'jira:issue_deleted'): merges the issue's new fields and history entry (every 'Vehicle State Impact' item of it, see compactItems) into the stored issue, then rebuilds the intervals of that issue only. Returns the key of the updated issue, or None if the payload was ignored (e.g. an issue of a site that isn't served).
+
+    The update is applied to a copy of the stored issue, which only replaces it once its intervals have been rebuilt, so a malformed payload (e.g. a new issue without fields.created) raises an AssertionError, KeyError, ValueError or TypeError and leaves the store as it was.
+    """
+    def applyWebhook(self, payload: dict) -> str:
+        assert isinstance(payload, dict), "The webhook payload must be a JSON object"
+        issue = payload.get('issue') or {}
+        key = issue.get('key')
+        site = key.split('-')[0] if isinstance(key, str) else None
+        if site not in self.issues:
+            return None
+
+        with self.lock:
+            if payload.get('webhookEvent') == 'jira:issue_deleted':
+                self.issues[site].pop(key, None)
+                self.intervals[site].pop(key, None)
+            else:
+                stored = self.issues[site].get(key) or {'key': key, 'id': issue.get('id'), 'fields': {}, 'changelog': {'startAt': 0, 'maxResults': 0, 'total': 0, 'histories': []}}
+                updated = {'key': key, 'id': stored['id'], 'fields': dict(stored['fields']), 'changelog': dict(stored['changelog'], histories=list(stored['changelog']['histories']))}
+                fields = issue.get('fields') or {}
+                for field in ('created', 'updated', 'customfield_10068', 'customfield_10064'):
+                    if field in fields:
+                        updated['fields'][field] = fields[field]
+                assert updated['fields'].get('created'), "Issue {0} is not stored yet and the payload has no fields.created".format(key)
+
+                changelog = payload.get('changelog') or {}
+                histories = updated['changelog']['histories']
+                if len(changelog.get('items') or []) > 0 and str(changelog.get('id')) not in {history['id'] for history in histories}:
+                    assert updated['fields'].get('updated'), "The payload for {0} has a changelog but no fields.updated to date it".format(key)
+                    histories.append({'id': str(int(changelog['id'])), 'created': updated['fields']['updated'], 'items': compactItems(changelog['items'])})
+                    histories.sort(key=lambda history: int(history['id']))
+                    updated['changelog'].update({'maxResults': len(histories), 'total': len(histories)})
+
+                # a new ticket only has intervals once it names a vehicle and has some history
+                rebuilt = {}
+                if updated['fields'].get('customfield_10068') and len(histories) > 0:
+                    rebuilt = splitByKey(self.generateIntervals([updated], self.window))
+                self.issues[site][key] = updated
+                if key in rebuilt:
+                    self.intervals[site][key] = rebuilt[key]
+                else:
+                    self.intervals[site].pop(key, None)
+            self.indexes.pop(site, None)
+        return key
+
+class RequestHandler(BaseHTTPRequestHandler):
+
+    def sendJson(self, status: int, body: dict):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    """
+    Returns the [start, end) range of a query: a quarter, start and end, or a rolling number of days ending at end. By default a rolling window ends now (or at the end of the loaded window if that comes first) and starts at midnight days - 1 days before, so the rest of today, which hasn't happened yet, isn't counted as auto ready time.
+    """
+    def queryRange(self, query: dict) -> tuple:
+        if 'quarter' in query:
+            assert query['quarter'] in ('1', '2', '3', '4'), "quarter must be 1, 2, 3 or 4, not {0}".format(query['quarter'])
+            return config.getQuarter(int(query['quarter']))
+        if 'days' in query:
+            days = np.timedelta64(int(query['days']), 'D')
+            if 'end' in query:
+                return str(np.datetime64(query['end']) - days), query['end']
+            end = min(np.datetime64(datetime.now(), 'm'), np.datetime64(self.server.store.window[1], 'm'))
+            lastDay = np.datetime64(end, 'D')
+            if end > lastDay:
+                lastDay += np.timedelta64(1, 'D')
+            return str(lastDay - days), str(end)
+        return query['start'], query['end']
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        store = self.server.store
+        try:
+            if url.path == '/readiness':
+                self.sendJson(200, store.readiness(query.get('site'), *self.queryRange(query)))
+            elif url.path == '/concurrency':
+                self.sendJson(200, store.concurrency(query.get('site'), *self.queryRange(query)))
+            elif url.path == '/down':
+                self.sendJson(200, store.down(query.get('site'), query['at']))
+            else:
+                self.sendJson(404, {'error': 'unknown path {0}'.format(url.path)})
+        except KeyError as error:
+            self.sendJson(400, {'error': 'missing query parameter {0}, expected site and either quarter, start and end, or days (or at, for /down)'.format(error)})
+        except (AssertionError, ValueError) as error:
+            self.sendJson(400, {'error': str(error)})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/webhook':
+            return self.sendJson(404, {'error': 'unknown path {0}'.format(self.path)})
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            updated = self.server.store.applyWebhook(payload)
+        except KeyError as error:
+            return self.sendJson(400, {'error': 'missing field {0} in the webhook payload'.format(error)})
+        except (AssertionError, ValueError, TypeError, AttributeError) as error:
+            return self.sendJson(400, {'error': str(error)})
+        self.sendJson(200, {'updated': updated})
+
+"""
+Serves the store on localhost:port until interrupted.
+"""
+def serve(store: ReadinessStore, port: int):
+    server = ThreadingHTTPServer(('127.0.0.1', port), RequestHandler)
+    server.store = store
+    print("Serving auto readiness on http://127.0.0.1:{0} (/readiness, /down, /concurrency)".format(port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,108 @@
+"""
+
+Synthetic ticket histories for a site's fleet, with known ground truth.
+
+generateTickets produces raw Jira issues (as served by tracker/fakeJira.py) whose 'Vehicle State Impact' history takes a vehicle down and brings it back, and returns the true downtime intervals alongside them. groundTruthDowntime then scores those intervals by brute force, one minute at a time, independently of the calendar and sweep code used by jira-tracker.py, so the two can be compared.
+
+All times fall on whole minutes and every ticket is created and resolved inside the date range, so the brute force count is exact.
+"""
+
+import numpy as np
+from pandas import Timestamp, Timedelta, date_range
+
+import config.config as config
+
+DOWN_STATES = ['Grounded', 'Manual Only']
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.000-0500'
+
+"""
+Generates numTickets tickets for the site's fleet over [start, end).
+
+Each ticket belongs to a random vehicle of config.mayFleet[site]. One in five tickets is created with the vehicle already down and brought back to Monitor; the rest are created in Monitor and take the vehicle down and back up one to three times. Down periods last meanDownHours on average (exponentially distributed), and unrelated 'status' changes are mixed into the histories. One in four 'Vehicle State Impact' changes is made together with a status change listed before it in the same history entry, as Jira records edits that change several fields at once.
+
+INPUT: site name, number of tickets, date range bounds ('YYYY-MM-DD'), random seed, mean length of a down period in hours
+OUTPUT: (issues, intervals), where issues is a list of raw Jira issue dicts and intervals is a list of [start minute, end minute, vehicle] downtime intervals, in minutes since start
+"""
+def generateTickets(site: str, numTickets: int, start: str, end: str, seed: int = 0, meanDownHours: float = 8.0) -> tuple:
+    rng = np.random.default_rng(seed)
+    fleet = config.mayFleet[site]
+    origin = Timestamp(start)
+    rangeMinutes = int((Timestamp(end) - origin) / Timedelta(minutes=1))
+    lastMinute = rangeMinutes - 1 # changes must happen strictly before the end of the range
+    issues, intervals = [], []
+    historyId = 0
+
+    for i in range(numTickets):
+        vehicle = fleet[int(rng.integers(len(fleet)))]
+        created = int(rng.integers(1, rangeMinutes - 2))
+        changes = [] # (minute, field, toString)
+
+        if rng.random() < 0.2:
+            initialImpact = DOWN_STATES[int(rng.integers(2))]
+            up = min(created + 1 + int(rng.exponential(meanDownHours * 60)), lastMinute)
+            changes.append((up, 'Vehicle State Impact', 'Monitor'))
+            intervals.append([created, up, vehicle])
+        else:
+            initialImpact = 'Monitor'
+            t = created
+            for _ in range(1 + int(rng.integers(3))):
+                down = t + 1 + int(rng.exponential(3 * 24 * 60))
+                if down >= lastMinute:
+                    break
+                up = min(down + 1 + int(rng.exponential(meanDownHours * 60)), lastMinute)
+                changes.append((down, 'Vehicle State Impact', DOWN_STATES[int(rng.integers(2))]))
+                changes.append((up, 'Vehicle State Impact', 'Monitor'))
+                intervals.append([down, up, vehicle])
+                t = up
+            if len(changes) == 0:
+                changes.append((lastMinute, 'status', 'Done'))
+
+        lastChange = changes[-1][0]
+        for minute in rng.integers(created, lastChange + 1, size=int(rng.integers(3))):
+            changes.append((int(minute), 'status', 'In Progress'))
+        changes.sort(key=lambda change: change[0])
+
+        histories = []
+        for minute, field, toString in changes:
+            historyId += 1
+            items = [{'field': field, 'toString': toString}]
+            if field == 'Vehicle State Impact' and rng.random() < 0.25:
+                items.insert(0, {'field': 'status', 'toString': 'In Progress'})
+            histories.append({'id': str(historyId), 'created': (origin + Timedelta(minutes=minute)).strftime(TIME_FORMAT), 'items': items})
+
+        issues.append({
+            'key': '{0}-{1}'.format(site, i + 1),
+            'id': str(10000 + i),
+            'fields': {
+                'created': (origin + Timedelta(minutes=created)).strftime(TIME_FORMAT),
+                'updated': histories[-1]['created'],
+                'customfield_10068': [vehicle.lower()],
+                'customfield_10064': {'value': 'Monitor'},
+            },
+            'changelog': {'histories': histories},
+        })
+
+    return issues, intervals
+
+"""
+Brute force reference for the accrued downtime of a site: walks [start, end) one minute at a time, counting the minutes where the site is open (weekday, not a holiday, within the site's hours) and the site's auto readiness definition fails. 
+
+INPUT: site name, downtime intervals as returned by generateTickets, date range bounds ('YYYY-MM-DD')
+OUTPUT: the downtime in seconds
+"""
+def groundTruthDowntime(site: str, intervals: list, start: str, end: str) -> int:
+    minutes = date_range(start, end, freq='min', inclusive='left')
+    openHour, closeHour = config.getSiteHours(site)
+    holidays = [Timestamp(*[int(part) for part in holiday.split(',')]) for holiday in config.holidays]
+    operating = (minutes.weekday < 5) & (minutes.hour >= openHour) & (minutes.hour < closeHour) & ~minutes.normalize().isin(holidays)
+
+    downVehicles = {vehicle: np.zeros(len(minutes), dtype=bool) for vehicle in config.mayFleet[site]}
+    for first, last, vehicle in intervals:
+        downVehicles[vehicle][first:last] = True
+
+    down = {vehicleClass: np.zeros(len(minutes), dtype=np.int64) for vehicleClass in config.vehicleClasses}
+    for vehicle, isDown in downVehicles.items():
+        down[config.getVehicleClass(site, vehicle)] += isDown
+
+    ready = np.asarray(config.getAutoReadiness(site)(down), dtype=bool)
+    return int((operating & ~ready).sum()) * 60